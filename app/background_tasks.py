@@ -105,6 +105,10 @@ class BackgroundTaskManager:
                 logger.info(f"Task '{name}' stopped")
 
         self.tasks.clear()
+
+        if self._notifier:
+            await self._notifier.close()
+
         logger.info("All background tasks stopped")
 
     async def _update_checker_task(self):
@@ -175,7 +179,7 @@ class BackgroundTaskManager:
                                 logger.info(f"Disabled expired user: {user.get('email', user['id'])}")
 
                                 # Send notification for important users
-                                if self._notifier and disabled_count <= 10:
+                                if self._notifier and self._notifier.is_configured() and disabled_count <= 10:
                                     from app.telegram_bot import AlertType
                                     await self._notifier.send_alert(
                                         AlertType.USER_EXPIRED,
@@ -293,7 +297,7 @@ class BackgroundTaskManager:
                     cpu = details.get("cpu_percent", 0)
                     mem = details.get("memory_percent", 0)
 
-                    if cpu > 90 and self._notifier:
+                    if cpu > 90 and self._notifier and self._notifier.is_configured():
                         from app.telegram_bot import AlertType
                         await self._notifier.send_alert(
                             AlertType.HIGH_CPU_LOAD,
@@ -301,7 +305,7 @@ class BackgroundTaskManager:
                             alert_key="cpu_high",
                         )
 
-                    if mem > 90 and self._notifier:
+                    if mem > 90 and self._notifier and self._notifier.is_configured():
                         from app.telegram_bot import AlertType
                         await self._notifier.send_alert(
                             AlertType.HIGH_MEMORY_USAGE,
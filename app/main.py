@@ -8,6 +8,7 @@ from fastapi import FastAPI, HTTPException, Depends, Query, Response, Cookie, Re
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
 import uvicorn
@@ -121,13 +122,10 @@ async def startup_event():
     await background_tasks.start()
     logger.info("Background tasks started successfully")
 
-    # Check SSL certificate and auto-renew if needed
+    # Check SSL certificate and auto-renew if needed (renewal itself runs in background)
     try:
-        ssl_result = ssl_manager.check_and_auto_renew()
-        if ssl_result.get("renewed"):
-            logger.info(f"SSL certificate auto-renewed: {ssl_result.get('message')}")
-        else:
-            logger.info(f"SSL check: {ssl_result.get('message')}")
+        ssl_result = await run_in_threadpool(ssl_manager.check_and_auto_renew)
+        logger.info(f"SSL check: {ssl_result.get('message')}")
     except Exception as e:
         logger.warning(f"SSL auto-check failed: {e}")
 
@@ -136,6 +134,7 @@ async def shutdown_event():
     """Остановка фоновых задач при остановке приложения"""
     logger.info("Application shutdown - stopping background tasks...")
     await background_tasks.stop()
+    await update_manager.close()
     logger.info("Background tasks stopped successfully")
 
 # ========================= API ENDPOINTS =========================
@@ -3068,7 +3067,7 @@ async def rollback_update(
                 detail="Update in progress, cannot rollback"
             )
 
-        result = update_manager.rollback(backup_path)
+        result = await update_manager.rollback(backup_path)
 
         if result["success"]:
             return result
@@ -3234,7 +3233,8 @@ async def git_commit_and_push(
                 detail="commit_message is required"
             )
 
-        result = update_manager.git_commit_and_push(
+        result = await run_in_threadpool(
+            update_manager.git_commit_and_push,
             commit_message=commit_message,
             github_token=github_token
         )
@@ -3730,14 +3730,13 @@ async def renew_ssl_certificate(
     username: str = Depends(get_current_user)
 ):
     """
-    Renew SSL certificate using Let's Encrypt with standalone mode.
+    Renew SSL certificate using Let's Encrypt.
 
     This will:
-    1. Stop nginx
-    2. Renew the certificate(s) using certbot --standalone
-    3. Start nginx
-    4. Update 3x-ui configuration
-    5. Restart 3x-ui service
+    1. Renew the certificate(s) using certbot --webroot via the running nginx
+    2. Fall back to certbot --standalone (nginx stopped, then started) if that fails
+    3. Update 3x-ui configuration
+    4. Restart 3x-ui service
     """
     try:
         # Parse domains list
@@ -3745,7 +3744,7 @@ async def renew_ssl_certificate(
         if domains:
             domains_list = [d.strip() for d in domains.split(',')]
 
-        result = ssl_manager.full_certificate_renewal(force=force, domains=domains_list)
+        result = await run_in_threadpool(ssl_manager.full_certificate_renewal, force=force, domains=domains_list)
 
         if result.get("success"):
             logger.info(f"SSL certificate renewal completed: {result.get('message')}")
@@ -3764,11 +3763,10 @@ async def get_all_ssl_domains(username: str = Depends(get_current_user)):
     Get all domains with Let's Encrypt certificates.
     """
     try:
-        domains = ssl_manager.get_all_domains()
+        certificates = ssl_manager.get_all_certificate_info()
         domains_info = []
 
-        for domain in domains:
-            cert_info = ssl_manager.get_certificate_info(domain)
+        for domain, cert_info in certificates.items():
             domains_info.append({
                 "domain": domain,
                 "status": cert_info.get("status"),
@@ -3779,7 +3777,7 @@ async def get_all_ssl_domains(username: str = Depends(get_current_user)):
 
         return {
             "success": True,
-            "count": len(domains),
+            "count": len(certificates),
             "domains": domains_info
         }
     except Exception as e:
@@ -3796,11 +3794,11 @@ async def update_3xui_certificate(username: str = Depends(get_current_user)):
     needs to be updated to use the new certificate.
     """
     try:
-        result = ssl_manager.update_3xui_certificate()
+        result = await run_in_threadpool(ssl_manager.update_3xui_certificate)
 
         if result.get("success"):
             # Restart 3x-ui to apply changes
-            restart_result = ssl_manager.restart_services()
+            restart_result = await run_in_threadpool(ssl_manager.restart_services)
             result["restart_result"] = restart_result
             logger.info("3x-ui certificate updated and services restarted")
 
@@ -3818,7 +3816,7 @@ async def restart_ssl_services(username: str = Depends(get_current_user)):
     Use after manual certificate changes to apply new certificate.
     """
     try:
-        result = ssl_manager.restart_services()
+        result = await run_in_threadpool(ssl_manager.restart_services)
         logger.info(f"Services restart requested: {result}")
         return {
             "success": True,
@@ -5342,11 +5340,14 @@ async def send_telegram_test(username: str = Depends(get_current_user)):
         notifier = get_notifier()
         if not notifier.is_configured():
             return {"success": False, "message": "Telegram bot not configured"}
-        await notifier.send_alert(
+        sent = await notifier.send_alert(
             AlertType.CUSTOM,
             f"🧪 Тестовое сообщение от XUI-Manager\nСервер: {settings.HOST}:{settings.PORT}\nВерсия: {CURRENT_VERSION}",
-            force=True
+            force=True,
+            immediate=True
         )
+        if not sent:
+            return {"success": False, "message": "Failed to deliver test message"}
         return {"success": True, "message": "Test message sent"}
     except ImportError:
         return {"success": False, "message": "Telegram module not available"}
@@ -8,16 +8,40 @@ import asyncio
 import json
 import logging
 import os
+import sys
 import time
+from collections import deque
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Deque, Dict, FrozenSet, List, Optional, Any
 from enum import Enum
 
 import aiohttp
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
+# slots=True is only accepted by dataclass() on Python 3.10+
+_DATACLASS_SLOTS: Dict[str, Any] = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+
+def _json_dumps(data: Any) -> bytes:
+    """Serialize to JSON bytes, using orjson when available"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data).encode()
+
+
+def _json_loads(data: bytes) -> Any:
+    """Parse JSON bytes, using orjson when available"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
 
 class SiteCategory(str, Enum):
     """Site categories"""
@@ -35,18 +59,23 @@ class SiteCategory(str, Enum):
     OTHER = "other"
 
 
-@dataclass
+@dataclass(frozen=True, **_DATACLASS_SLOTS)
 class SiteConfig:
-    """Site configuration for checking"""
+    """Site configuration for checking (immutable, shared by all checks)"""
     url: str
     name: str
     category: SiteCategory
-    blocked_in: List[str] = field(default_factory=list)  # Region codes where blocked
+    blocked_in: FrozenSet[str] = frozenset()  # Region codes where blocked
     importance: int = 1  # 1-3, higher = more important
     check_method: str = "head"  # head, get
+    _use_head: bool = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        # Resolve the HTTP method once instead of on every check
+        object.__setattr__(self, "_use_head", self.check_method == "head")
 
 
-@dataclass
+@dataclass(**_DATACLASS_SLOTS)
 class SiteCheckResult:
     """Result of site accessibility check"""
     url: str
@@ -70,42 +99,42 @@ SITE_WHITELIST: List[SiteConfig] = [
         url="https://www.instagram.com",
         name="Instagram",
         category=SiteCategory.SOCIAL,
-        blocked_in=["RU"],
+        blocked_in=frozenset({"RU"}),
         importance=3,
     ),
     SiteConfig(
         url="https://twitter.com",
         name="Twitter/X",
         category=SiteCategory.SOCIAL,
-        blocked_in=["RU", "CN"],
+        blocked_in=frozenset({"RU", "CN"}),
         importance=3,
     ),
     SiteConfig(
         url="https://www.facebook.com",
         name="Facebook",
         category=SiteCategory.SOCIAL,
-        blocked_in=["RU", "CN"],
+        blocked_in=frozenset({"RU", "CN"}),
         importance=3,
     ),
     SiteConfig(
         url="https://www.linkedin.com",
         name="LinkedIn",
         category=SiteCategory.SOCIAL,
-        blocked_in=["RU"],
+        blocked_in=frozenset({"RU"}),
         importance=2,
     ),
     SiteConfig(
         url="https://www.tiktok.com",
         name="TikTok",
         category=SiteCategory.SOCIAL,
-        blocked_in=[],
+        blocked_in=frozenset(),
         importance=2,
     ),
     SiteConfig(
         url="https://www.threads.net",
         name="Threads",
         category=SiteCategory.SOCIAL,
-        blocked_in=["RU"],
+        blocked_in=frozenset({"RU"}),
         importance=2,
     ),
 
@@ -114,21 +143,21 @@ SITE_WHITELIST: List[SiteConfig] = [
         url="https://www.youtube.com",
         name="YouTube",
         category=SiteCategory.VIDEO,
-        blocked_in=["CN"],
+        blocked_in=frozenset({"CN"}),
         importance=3,
     ),
     SiteConfig(
         url="https://vimeo.com",
         name="Vimeo",
         category=SiteCategory.VIDEO,
-        blocked_in=[],
+        blocked_in=frozenset(),
         importance=1,
     ),
     SiteConfig(
         url="https://www.twitch.tv",
         name="Twitch",
         category=SiteCategory.VIDEO,
-        blocked_in=[],
+        blocked_in=frozenset(),
         importance=2,
     ),
 
@@ -137,28 +166,28 @@ SITE_WHITELIST: List[SiteConfig] = [
         url="https://web.telegram.org",
         name="Telegram Web",
         category=SiteCategory.MESSENGER,
-        blocked_in=["CN", "IR"],
+        blocked_in=frozenset({"CN", "IR"}),
         importance=3,
     ),
     SiteConfig(
         url="https://discord.com",
         name="Discord",
         category=SiteCategory.MESSENGER,
-        blocked_in=["RU", "CN", "UAE"],
+        blocked_in=frozenset({"RU", "CN", "UAE"}),
         importance=3,
     ),
     SiteConfig(
         url="https://web.whatsapp.com",
         name="WhatsApp Web",
         category=SiteCategory.MESSENGER,
-        blocked_in=["CN"],
+        blocked_in=frozenset({"CN"}),
         importance=2,
     ),
     SiteConfig(
         url="https://signal.org",
         name="Signal",
         category=SiteCategory.MESSENGER,
-        blocked_in=["CN", "IR"],
+        blocked_in=frozenset({"CN", "IR"}),
         importance=2,
     ),
 
@@ -167,21 +196,21 @@ SITE_WHITELIST: List[SiteConfig] = [
         url="https://www.google.com",
         name="Google",
         category=SiteCategory.SEARCH,
-        blocked_in=["CN"],
+        blocked_in=frozenset({"CN"}),
         importance=3,
     ),
     SiteConfig(
         url="https://duckduckgo.com",
         name="DuckDuckGo",
         category=SiteCategory.SEARCH,
-        blocked_in=[],
+        blocked_in=frozenset(),
         importance=2,
     ),
     SiteConfig(
         url="https://www.bing.com",
         name="Bing",
         category=SiteCategory.SEARCH,
-        blocked_in=[],
+        blocked_in=frozenset(),
         importance=1,
     ),
 
@@ -190,35 +219,35 @@ SITE_WHITELIST: List[SiteConfig] = [
         url="https://chat.openai.com",
         name="ChatGPT",
         category=SiteCategory.AI,
-        blocked_in=["RU", "CN"],
+        blocked_in=frozenset({"RU", "CN"}),
         importance=3,
     ),
     SiteConfig(
         url="https://claude.ai",
         name="Claude",
         category=SiteCategory.AI,
-        blocked_in=["RU"],
+        blocked_in=frozenset({"RU"}),
         importance=3,
     ),
     SiteConfig(
         url="https://gemini.google.com",
         name="Google Gemini",
         category=SiteCategory.AI,
-        blocked_in=["RU"],
+        blocked_in=frozenset({"RU"}),
         importance=2,
     ),
     SiteConfig(
         url="https://copilot.microsoft.com",
         name="Microsoft Copilot",
         category=SiteCategory.AI,
-        blocked_in=[],
+        blocked_in=frozenset(),
         importance=2,
     ),
     SiteConfig(
         url="https://www.midjourney.com",
         name="Midjourney",
         category=SiteCategory.AI,
-        blocked_in=[],
+        blocked_in=frozenset(),
         importance=2,
     ),
 
@@ -227,35 +256,35 @@ SITE_WHITELIST: List[SiteConfig] = [
         url="https://www.netflix.com",
         name="Netflix",
         category=SiteCategory.STREAMING,
-        blocked_in=[],
+        blocked_in=frozenset(),
         importance=2,
     ),
     SiteConfig(
         url="https://www.spotify.com",
         name="Spotify",
         category=SiteCategory.STREAMING,
-        blocked_in=["RU"],
+        blocked_in=frozenset({"RU"}),
         importance=2,
     ),
     SiteConfig(
         url="https://music.apple.com",
         name="Apple Music",
         category=SiteCategory.STREAMING,
-        blocked_in=[],
+        blocked_in=frozenset(),
         importance=2,
     ),
     SiteConfig(
         url="https://www.primevideo.com",
         name="Amazon Prime Video",
         category=SiteCategory.STREAMING,
-        blocked_in=[],
+        blocked_in=frozenset(),
         importance=1,
     ),
     SiteConfig(
         url="https://www.hbomax.com",
         name="HBO Max",
         category=SiteCategory.STREAMING,
-        blocked_in=[],
+        blocked_in=frozenset(),
         importance=1,
     ),
 
@@ -264,28 +293,28 @@ SITE_WHITELIST: List[SiteConfig] = [
         url="https://www.bbc.com",
         name="BBC",
         category=SiteCategory.NEWS,
-        blocked_in=["RU"],
+        blocked_in=frozenset({"RU"}),
         importance=2,
     ),
     SiteConfig(
         url="https://www.dw.com",
         name="Deutsche Welle",
         category=SiteCategory.NEWS,
-        blocked_in=["RU"],
+        blocked_in=frozenset({"RU"}),
         importance=2,
     ),
     SiteConfig(
         url="https://meduza.io",
         name="Meduza",
         category=SiteCategory.NEWS,
-        blocked_in=["RU"],
+        blocked_in=frozenset({"RU"}),
         importance=2,
     ),
     SiteConfig(
         url="https://www.cnn.com",
         name="CNN",
         category=SiteCategory.NEWS,
-        blocked_in=[],
+        blocked_in=frozenset(),
         importance=1,
     ),
 
@@ -294,42 +323,42 @@ SITE_WHITELIST: List[SiteConfig] = [
         url="https://github.com",
         name="GitHub",
         category=SiteCategory.WORK,
-        blocked_in=[],
+        blocked_in=frozenset(),
         importance=3,
     ),
     SiteConfig(
         url="https://gitlab.com",
         name="GitLab",
         category=SiteCategory.WORK,
-        blocked_in=[],
+        blocked_in=frozenset(),
         importance=2,
     ),
     SiteConfig(
         url="https://www.notion.so",
         name="Notion",
         category=SiteCategory.WORK,
-        blocked_in=[],
+        blocked_in=frozenset(),
         importance=2,
     ),
     SiteConfig(
         url="https://www.figma.com",
         name="Figma",
         category=SiteCategory.WORK,
-        blocked_in=[],
+        blocked_in=frozenset(),
         importance=2,
     ),
     SiteConfig(
         url="https://slack.com",
         name="Slack",
         category=SiteCategory.WORK,
-        blocked_in=[],
+        blocked_in=frozenset(),
         importance=2,
     ),
     SiteConfig(
         url="https://zoom.us",
         name="Zoom",
         category=SiteCategory.WORK,
-        blocked_in=[],
+        blocked_in=frozenset(),
         importance=2,
     ),
 
@@ -338,14 +367,14 @@ SITE_WHITELIST: List[SiteConfig] = [
         url="https://store.steampowered.com",
         name="Steam",
         category=SiteCategory.GAMING,
-        blocked_in=[],
+        blocked_in=frozenset(),
         importance=2,
     ),
     SiteConfig(
         url="https://www.epicgames.com",
         name="Epic Games",
         category=SiteCategory.GAMING,
-        blocked_in=[],
+        blocked_in=frozenset(),
         importance=1,
     ),
 
@@ -354,35 +383,35 @@ SITE_WHITELIST: List[SiteConfig] = [
         url="https://www.yandex.ru",
         name="Yandex",
         category=SiteCategory.RU_SERVICE,
-        blocked_in=[],
+        blocked_in=frozenset(),
         importance=3,
     ),
     SiteConfig(
         url="https://vk.com",
         name="VKontakte",
         category=SiteCategory.RU_SERVICE,
-        blocked_in=[],
+        blocked_in=frozenset(),
         importance=3,
     ),
     SiteConfig(
         url="https://ok.ru",
         name="Odnoklassniki",
         category=SiteCategory.RU_SERVICE,
-        blocked_in=[],
+        blocked_in=frozenset(),
         importance=2,
     ),
     SiteConfig(
         url="https://mail.ru",
         name="Mail.ru",
         category=SiteCategory.RU_SERVICE,
-        blocked_in=[],
+        blocked_in=frozenset(),
         importance=2,
     ),
     SiteConfig(
         url="https://www.gosuslugi.ru",
         name="Gosuslugi",
         category=SiteCategory.RU_SERVICE,
-        blocked_in=[],
+        blocked_in=frozenset(),
         importance=3,
     ),
 
@@ -391,21 +420,21 @@ SITE_WHITELIST: List[SiteConfig] = [
         url="https://www.cloudflare.com",
         name="Cloudflare",
         category=SiteCategory.TECH,
-        blocked_in=[],
+        blocked_in=frozenset(),
         importance=2,
     ),
     SiteConfig(
         url="https://aws.amazon.com",
         name="AWS",
         category=SiteCategory.TECH,
-        blocked_in=[],
+        blocked_in=frozenset(),
         importance=2,
     ),
     SiteConfig(
         url="https://www.docker.com",
         name="Docker",
         category=SiteCategory.TECH,
-        blocked_in=[],
+        blocked_in=frozenset(),
         importance=2,
     ),
 ]
@@ -419,117 +448,186 @@ class SiteAccessChecker:
     Tracks results history for trend analysis.
     """
 
+    # Upper bound on kept history entries (24h at a 30s check cadence)
+    HISTORY_MAXLEN = 2880
+
+    # Rewrite the append-only results file after this many saves
+    COMPACT_EVERY = 100
+
+    # Max checks in flight (and open connections) per batch
+    MAX_CONCURRENT_CHECKS = 10
+
+    # Request headers shared by every check
+    _HEADERS = {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+    }
+
     def __init__(
         self,
         timeout: int = 10,
         results_file: str = "/opt/xui-manager/site_check_results.json"
     ):
         self.timeout = timeout
+        self._client_timeout = aiohttp.ClientTimeout(total=timeout)
         self.results_file = results_file
         self.last_results: Dict[str, SiteCheckResult] = {}
-        self.history: List[Dict[str, Any]] = []
+        self.history: Deque[Dict[str, Any]] = deque(maxlen=self.HISTORY_MAXLEN)
+        self._saves_since_compact = 0
+        self._dir_ready = False
 
         self._load_results()
 
     def _load_results(self):
-        """Load previous results from file"""
+        """Load previous results from file (one JSON entry per line)"""
         try:
             if os.path.exists(self.results_file):
-                with open(self.results_file, 'r') as f:
-                    data = json.load(f)
-                    self.history = data.get("history", [])
+                cutoff = time.time() - 86400
+                with open(self.results_file, 'rb') as f:
+                    for line in f:
+                        if not line.strip():
+                            continue
+                        try:
+                            data = _json_loads(line)
+                        except ValueError:
+                            # Torn last line after a crash
+                            continue
+                        # Older versions stored a single {"history": [...]} document
+                        entries = data["history"] if "history" in data else (data,)
+                        for entry in entries:
+                            if entry.get("timestamp", 0) > cutoff:
+                                self.history.append(entry)
+
+                self._compact_results()
         except Exception as e:
             logger.error(f"Error loading site check results: {e}")
 
-    def _save_results(self):
-        """Save results to file"""
+    def _compact_results(self):
+        """Rewrite results file with only the retained history"""
+        # Write to a temp file and rename so readers never see a partial file
+        tmp_file = self.results_file + '.tmp'
+        with open(tmp_file, 'wb') as f:
+            f.writelines(_json_dumps(entry) + b'\n' for entry in self.history)
+        os.replace(tmp_file, self.results_file)
+        self._saves_since_compact = 0
+
+    def _save_results(self, entry: Dict[str, Any]):
+        """Append history entry to results file"""
         try:
-            os.makedirs(os.path.dirname(self.results_file), exist_ok=True)
+            if not self._dir_ready:
+                os.makedirs(os.path.dirname(self.results_file), exist_ok=True)
+                self._dir_ready = True
 
-            # Keep only last 24 hours of history
+            # Keep only last 24 hours of history (entries are appended in time order)
             cutoff = time.time() - 86400
-            self.history = [h for h in self.history if h.get("timestamp", 0) > cutoff]
+            while self.history and self.history[0].get("timestamp", 0) <= cutoff:
+                self.history.popleft()
+
+            with open(self.results_file, 'ab') as f:
+                f.write(_json_dumps(entry) + b'\n')
 
-            with open(self.results_file, 'w') as f:
-                json.dump({
-                    "last_check": time.time(),
-                    "history": self.history,
-                }, f)
+            # Periodically drop expired lines from the file
+            self._saves_since_compact += 1
+            if self._saves_since_compact >= self.COMPACT_EVERY:
+                self._compact_results()
         except Exception as e:
             logger.error(f"Error saving site check results: {e}")
 
+    def _create_session(self, limit: int = 100) -> aiohttp.ClientSession:
+        """Create HTTP session for site checks"""
+        # Proxy connector is not wired up yet, checks go direct
+        return aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=limit),
+            timeout=self._client_timeout
+        )
+
     async def check_site(
         self,
         site: SiteConfig,
-        proxy: Optional[str] = None
+        proxy: Optional[str] = None,
+        session: Optional[aiohttp.ClientSession] = None
     ) -> SiteCheckResult:
-        """Check single site accessibility"""
+        """
+        Check single site accessibility
+
+        Pass a shared session to reuse its connection pool across checks.
+        """
+        if session is None:
+            async with self._create_session() as own_session:
+                return await self.check_site(site, proxy, own_session)
+
+        via_proxy = proxy is not None
         start_time = time.time()
 
         try:
-            connector = None
-            if proxy:
-                # Setup proxy if provided
-                pass
-
-            async with aiohttp.ClientSession(
-                connector=connector,
-                timeout=aiohttp.ClientTimeout(total=self.timeout)
-            ) as session:
-                method = session.head if site.check_method == "head" else session.get
-
-                async with method(
-                    site.url,
-                    allow_redirects=True,
-                    headers={
-                        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-                    }
-                ) as response:
-                    latency = (time.time() - start_time) * 1000
-
-                    return SiteCheckResult(
-                        url=site.url,
-                        name=site.name,
-                        category=site.category.value,
-                        accessible=response.status < 400,
-                        status_code=response.status,
-                        latency_ms=latency,
-                        checked_via_proxy=proxy is not None,
-                    )
-
-        except asyncio.TimeoutError:
-            return SiteCheckResult(
-                url=site.url,
-                name=site.name,
-                category=site.category.value,
-                accessible=False,
-                status_code=0,
-                latency_ms=(time.time() - start_time) * 1000,
-                error="Timeout",
-                checked_via_proxy=proxy is not None,
-            )
-        except aiohttp.ClientError as e:
-            return SiteCheckResult(
-                url=site.url,
-                name=site.name,
-                category=site.category.value,
-                accessible=False,
-                status_code=0,
-                latency_ms=(time.time() - start_time) * 1000,
-                error=str(e),
-                checked_via_proxy=proxy is not None,
-            )
+            method = session.head if site._use_head else session.get
+
+            async with method(
+                site.url,
+                allow_redirects=True,
+                headers=self._HEADERS
+            ) as response:
+                latency = round((time.time() - start_time) * 1000, 2)
+
+                return SiteCheckResult(
+                    url=site.url,
+                    name=site.name,
+                    category=site.category.value,
+                    accessible=response.status < 400,
+                    status_code=response.status,
+                    latency_ms=latency,
+                    checked_via_proxy=via_proxy,
+                )
+
         except Exception as e:
-            return SiteCheckResult(
-                url=site.url,
-                name=site.name,
-                category=site.category.value,
-                accessible=False,
-                status_code=0,
-                latency_ms=(time.time() - start_time) * 1000,
-                error=f"Error: {str(e)}",
-                checked_via_proxy=proxy is not None,
-            )
+            if isinstance(e, asyncio.TimeoutError):
+                error = "Timeout"
+            elif isinstance(e, aiohttp.ClientError):
+                error = str(e)
+            else:
+                error = f"Error: {str(e)}"
+            return self._error_result(site, via_proxy, start_time, error)
+
+    def _error_result(
+        self,
+        site: SiteConfig,
+        via_proxy: bool,
+        start_time: float,
+        error: str
+    ) -> SiteCheckResult:
+        """Build result for a failed check"""
+        return SiteCheckResult(
+            url=site.url,
+            name=site.name,
+            category=site.category.value,
+            accessible=False,
+            status_code=0,
+            latency_ms=round((time.time() - start_time) * 1000, 2),
+            error=error,
+            checked_via_proxy=via_proxy,
+        )
+
+    async def _check_sites(
+        self,
+        sites: List[SiteConfig],
+        proxy: Optional[str] = None
+    ) -> List[SiteCheckResult]:
+        """Check sites over one shared session with a fixed pool of workers"""
+        queue: asyncio.Queue = asyncio.Queue()
+        for item in enumerate(sites):
+            queue.put_nowait(item)
+
+        results: List[Optional[SiteCheckResult]] = [None] * len(sites)
+
+        async with self._create_session(limit=self.MAX_CONCURRENT_CHECKS) as session:
+            async def worker():
+                while not queue.empty():
+                    index, site = queue.get_nowait()
+                    results[index] = await self.check_site(site, proxy, session)
+
+            workers = min(self.MAX_CONCURRENT_CHECKS, len(sites))
+            await asyncio.gather(*(worker() for _ in range(workers)))
+
+        return results
 
     async def check_all_sites(
         self,
@@ -570,54 +668,54 @@ class SiteAccessChecker:
             }
 
         # Run checks in parallel (with concurrency limit)
-        semaphore = asyncio.Semaphore(10)  # Max 10 concurrent checks
-
-        async def check_with_limit(site):
-            async with semaphore:
-                return await self.check_site(site, proxy)
-
-        tasks = [check_with_limit(site) for site in sites_to_check]
-        results = await asyncio.gather(*tasks)
+        results = await self._check_sites(sites_to_check, proxy)
 
         # Process results
         accessible = [r for r in results if r.accessible]
         failed = [r for r in results if not r.accessible]
 
         # Calculate stats
-        avg_latency = sum(r.latency_ms for r in accessible) / len(accessible) if accessible else 0
+        avg_latency = round(sum(r.latency_ms for r in accessible) / len(accessible), 2) if accessible else 0
+        via_proxy = proxy is not None
 
-        # Group by category
-        by_category: Dict[str, Dict[str, int]] = {}
+        # Group by category (keys are known up front from the checked sites)
+        by_category: Dict[str, Dict[str, int]] = {
+            category: {"total": 0, "accessible": 0}
+            for category in dict.fromkeys(s.category.value for s in sites_to_check)
+        }
         for r in results:
-            if r.category not in by_category:
-                by_category[r.category] = {"total": 0, "accessible": 0}
-            by_category[r.category]["total"] += 1
+            counts = by_category[r.category]
+            counts["total"] += 1
             if r.accessible:
-                by_category[r.category]["accessible"] += 1
+                counts["accessible"] += 1
 
         # Store results
         self.last_results = {r.url: r for r in results}
 
+        # Single timestamp shared by the history entry and the summary
+        now_ts = time.time()
+
         # Add to history
-        self.history.append({
-            "timestamp": time.time(),
+        entry = {
+            "timestamp": now_ts,
             "total": len(results),
             "accessible": len(accessible),
             "failed": len(failed),
             "avg_latency_ms": avg_latency,
-            "via_proxy": proxy is not None,
-        })
+            "via_proxy": via_proxy,
+        }
+        self.history.append(entry)
 
-        self._save_results()
+        self._save_results(entry)
 
         return {
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": datetime.fromtimestamp(now_ts).isoformat(timespec="seconds"),
             "total": len(results),
             "accessible": len(accessible),
             "failed": len(failed),
             "accessibility_rate": len(accessible) / len(results) * 100 if results else 0,
-            "avg_latency_ms": round(avg_latency, 2),
-            "via_proxy": proxy is not None,
+            "avg_latency_ms": avg_latency,
+            "via_proxy": via_proxy,
             "by_category": by_category,
             "failed_sites": [
                 {
@@ -629,7 +727,7 @@ class SiteAccessChecker:
                 for r in failed
             ],
             "slowest_sites": sorted(
-                [{"name": r.name, "latency_ms": round(r.latency_ms, 2)} for r in accessible],
+                [{"name": r.name, "latency_ms": r.latency_ms} for r in accessible],
                 key=lambda x: x["latency_ms"],
                 reverse=True
             )[:5],
@@ -660,8 +758,7 @@ class SiteAccessChecker:
             }
 
         # Check blocked sites
-        tasks = [self.check_site(site, proxy) for site in blocked_sites]
-        results = await asyncio.gather(*tasks)
+        results = await self._check_sites(blocked_sites, proxy)
 
         accessible = [r for r in results if r.accessible]
         failed = [r for r in results if not r.accessible]
@@ -678,7 +775,7 @@ class SiteAccessChecker:
                     "name": r.name,
                     "url": r.url,
                     "accessible": r.accessible,
-                    "latency_ms": round(r.latency_ms, 2) if r.accessible else None,
+                    "latency_ms": r.latency_ms if r.accessible else None,
                     "error": r.error,
                 }
                 for r in results
@@ -691,7 +788,7 @@ class SiteAccessChecker:
             {
                 "url": s.url,
                 "name": s.name,
-                "blocked_in": s.blocked_in,
+                "blocked_in": sorted(s.blocked_in),
                 "importance": s.importance,
             }
             for s in SITE_WHITELIST
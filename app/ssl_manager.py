@@ -4,18 +4,140 @@ Handles certificate renewal, status checks, and 3x-ui integration.
 """
 
 import os
+import re
 import ssl
 import socket
 import subprocess
 import sqlite3
 import json
 import logging
-from datetime import datetime, timedelta
+import shutil
+import atexit
+import functools
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Optional, Dict, Any, Tuple
+from typing import Optional, Dict, Any, Tuple, Callable, Iterator
+
+try:
+    from cryptography import x509
+except ImportError:
+    x509 = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from jeepney import DBusAddress, MatchRule, new_method_call
+    from jeepney.bus_messages import message_bus
+    from jeepney.io.blocking import open_dbus_connection
+    from jeepney.wrappers import DBusErrorResponse, unwrap_msg
+except ImportError:
+    open_dbus_connection = None
 
 logger = logging.getLogger(__name__)
 
+# Applied once per cached connection to the 3x-ui database. Only per-connection
+# settings: the journal mode and sync level of x-ui's database are left to x-ui.
+_XUI_DB_PRAGMAS = """
+    PRAGMA busy_timeout=5000;
+    PRAGMA cache_size=-20000;
+    PRAGMA mmap_size=268435456;
+    PRAGMA temp_store=memory;
+"""
+
+# Kept as constants so the cached connection's statement cache reuses them
+_SETTINGS_SQL_BASIC = """
+    SELECT key, value FROM settings
+    WHERE key IN ('webCertFile', 'webKeyFile', 'webDomain')
+    AND value IS NOT NULL AND value != ''
+"""
+_SETTINGS_SQL_ALL = """
+    SELECT key, value FROM settings
+    WHERE key IN ('webCertFile', 'webKeyFile', 'webDomain', 'tgBotChatId', 'webListen')
+    AND value IS NOT NULL AND value != ''
+"""
+_SETTINGS_UPSERT_SQL = "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)"
+_INBOUND_STREAM_SQL = "SELECT stream_settings FROM inbounds WHERE stream_settings IS NOT NULL"
+# Reality serverNames and TLS serverName of all inbounds, skipping malformed JSON
+_INBOUND_SNI_SQL = """
+    WITH streams AS (
+        SELECT stream_settings AS j FROM inbounds
+        WHERE stream_settings IS NOT NULL AND json_valid(stream_settings)
+    )
+    SELECT sni.value FROM streams, json_each(streams.j, '$.realitySettings.serverNames') AS sni
+    WHERE sni.type = 'text' AND instr(sni.value, '.') > 0
+    UNION
+    SELECT json_extract(j, '$.tlsSettings.serverName') AS sni FROM streams
+    WHERE json_type(j, '$.tlsSettings.serverName') = 'text' AND instr(sni, '.') > 0
+"""
+
+# Fields of `openssl x509 -noout -dates -subject` output
+_OPENSSL_FIELD_RE = re.compile(r'^(notBefore|notAfter|subject)=(.*)$', re.MULTILINE)
+
+# Month abbreviations in OpenSSL dates (always English, independent of locale)
+_OPENSSL_MONTHS = {
+    'Jan': 1, 'Feb': 2, 'Mar': 3, 'Apr': 4, 'May': 5, 'Jun': 6,
+    'Jul': 7, 'Aug': 8, 'Sep': 9, 'Oct': 10, 'Nov': 11, 'Dec': 12,
+}
+
+# Nginx server_name directive (configs are scanned in binary mode)
+_SERVER_NAME_RE = re.compile(rb'server_name\s+([^\s;]+)')
+
+# systemd manager methods for unit actions (talked to over DBus when jeepney is available)
+_SYSTEMD_UNIT_METHODS = {
+    'start': 'StartUnit',
+    'stop': 'StopUnit',
+    'reload': 'ReloadUnit',
+    'restart': 'RestartUnit',
+}
+
+
+@functools.lru_cache(maxsize=64)
+def _paths_for(base: str, domain: str) -> Tuple[str, str]:
+    """Return (fullchain.pem, privkey.pem) paths of a Let's Encrypt live domain."""
+    live_dir = os.path.join(base, domain)
+    return os.path.join(live_dir, "fullchain.pem"), os.path.join(live_dir, "privkey.pem")
+
+
+def _stat_or_none(path: str) -> Optional[os.stat_result]:
+    """Stat path, returning None if it does not exist."""
+    try:
+        return os.stat(path)
+    except FileNotFoundError:
+        return None
+
+
+def _read_json_file(path: str) -> Any:
+    """Read JSON file, using orjson when available."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def _write_json_file(path: str, data: Any):
+    """Atomically replace JSON file (indented), keeping its permissions."""
+    if orjson is not None:
+        payload = orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    else:
+        payload = json.dumps(data, indent=2).encode()
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(payload)
+        # Data must be on disk before the rename, or a crash can leave an empty config.json
+        f.flush()
+        os.fsync(f.fileno())
+    # One stat for both the existence check and the mode (shutil.copymode would stat again)
+    st = _stat_or_none(path)
+    if st is not None:
+        os.chmod(tmp_path, st.st_mode & 0o7777)
+    os.replace(tmp_path, path)
+
 
 class SSLManager:
     """Manager for SSL certificates with Let's Encrypt support."""
@@ -25,53 +147,204 @@ class SSLManager:
         self.xui_config_path = "/usr/local/x-ui/bin/config.json"
         self.letsencrypt_base = "/etc/letsencrypt/live"
         self.renewal_threshold_days = 30  # Renew if less than 30 days left
+        self.domain_cache_ttl = 300  # Seconds to cache domain discovery results
+        # Nginx serves /.well-known/acme-challenge/ from here (see install.sh)
+        self.webroot_path = "/var/www/html"
+        self.use_standalone = False  # Always stop nginx and use certbot --standalone
+
+        # Domain discovery results: key -> (monotonic time, value)
+        self._domain_cache: Dict[str, Tuple[float, Any]] = {}
+
+        # certbot executable, looked up on first renewal
+        self._certbot_path: Optional[str] = None
+
+        # Held for the whole renew/update/restart chain; certbot can't run concurrently anyway
+        self._renewal_lock = threading.Lock()
+
+        # Parsed certificates: cert path -> ((inode, mtime_ns, size), parsed fields)
+        self._cert_cache: Dict[str, Tuple[Tuple[int, int, int], Tuple[Optional[datetime], Optional[datetime], Optional[str]]]] = {}
+
+        # Cached connection to 3x-ui database, shared across request threads
+        self._conn: Optional[sqlite3.Connection] = None
+        self._conn_ino: Optional[int] = None
+        self._conn_lock = threading.Lock()
+        atexit.register(self.close)
+
+    def _get_conn(self) -> sqlite3.Connection:
+        """Get cached 3x-ui database connection. Caller must hold _conn_lock."""
+        # Reopen if the database file was replaced (e.g. restored from backup)
+        ino = os.stat(self.xui_db_path).st_ino
+        if self._conn is not None and ino != self._conn_ino:
+            self._conn.close()
+            self._conn = None
+
+        if self._conn is None:
+            # mode=rw: never create an empty x-ui.db if the file vanished after the stat
+            self._conn = sqlite3.connect(
+                f"{Path(self.xui_db_path).absolute().as_uri()}?mode=rw",
+                uri=True,
+                check_same_thread=False,
+                isolation_level=None,
+                cached_statements=256
+            )
+            self._conn_ino = ino
+            try:
+                self._conn.executescript(_XUI_DB_PRAGMAS)
+            except sqlite3.Error as e:
+                logger.warning(f"Could not apply PRAGMAs to x-ui database: {e}")
+        return self._conn
+
+    def close(self):
+        """Close cached database connection."""
+        with self._conn_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _systemctl(self, action: str, unit: str, timeout: float = 90) -> Tuple[bool, str]:
+        """
+        Start/stop/reload/restart a systemd unit and wait for the job to finish.
+
+        Talks to systemd over DBus when possible, otherwise runs systemctl.
+        Returns (success, error message).
+        """
+        if open_dbus_connection is not None:
+            try:
+                return self._systemd_job(action, unit, timeout)
+            except DBusErrorResponse as e:
+                return False, str(e)
+            except Exception as e:
+                # Only reached when the job was never queued, so systemctl won't repeat it
+                logger.debug(f"DBus {action} {unit} failed, falling back to systemctl: {e}")
+
+        # Only stderr is reported; stdout would be piped and thrown away
+        result = subprocess.run(['systemctl', action, unit], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        return result.returncode == 0, result.stderr
+
+    def _systemd_job(self, action: str, unit: str, timeout: float) -> Tuple[bool, str]:
+        """
+        Queue systemd job over DBus and wait for it.
+
+        Each job gets its own connection, so concurrent jobs (nginx reload and
+        x-ui restart) wait in parallel. Raises only while queueing the job; once
+        queued, a timeout or lost connection is reported as a failure.
+        """
+        manager = DBusAddress(
+            '/org/freedesktop/systemd1',
+            bus_name='org.freedesktop.systemd1',
+            interface='org.freedesktop.systemd1.Manager'
+        )
+        job_removed = MatchRule(
+            type='signal',
+            interface='org.freedesktop.systemd1.Manager',
+            member='JobRemoved',
+            path='/org/freedesktop/systemd1'
+        )
+
+        deadline = time.monotonic() + timeout
+        with open_dbus_connection(bus='SYSTEM') as conn:
+            # systemd only emits job signals to subscribed clients
+            unwrap_msg(conn.send_and_get_reply(new_method_call(manager, 'Subscribe'), timeout=timeout))
+            unwrap_msg(conn.send_and_get_reply(message_bus.AddMatch(job_removed), timeout=timeout))
+
+            with conn.filter(job_removed, bufsize=64) as jobs:
+                call = new_method_call(manager, _SYSTEMD_UNIT_METHODS[action], 'ss', (f"{unit}.service", 'replace'))
+                try:
+                    job_path = unwrap_msg(conn.send_and_get_reply(call, timeout=timeout))[0]
+                except TimeoutError:
+                    # systemd may have queued the job anyway; don't let the caller repeat it
+                    return False, f"Timed out after {timeout:.0f}s queueing {action} job for {unit}"
+
+                try:
+                    while True:
+                        signal = conn.recv_until_filtered(jobs, timeout=max(0.0, deadline - time.monotonic()))
+                        _, job, _, result = signal.body
+                        if job == job_path:
+                            if result == 'done':
+                                return True, ""
+                            return False, f"{action} job for {unit} finished with result '{result}'"
+                except TimeoutError:
+                    return False, f"Timed out after {timeout:.0f}s waiting for {action} job for {unit}"
+                except Exception as e:
+                    return False, f"Lost track of {action} job for {unit}: {e}"
+
+    def _nginx_config_ok(self) -> Tuple[bool, str]:
+        """Run `nginx -t` against the config and certificates currently on disk.
+
+        Not cached: certificates and configs may have been rewritten since the
+        last check, and a reload must never pick up an untested config.
+        """
+        # nginx -t reports on stderr only
+        test_result = subprocess.run(['nginx', '-t'], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        if test_result.returncode != 0:
+            return False, test_result.stderr
+        return True, ""
+
+    def _cached(self, key: str, loader: Callable[[], Any]) -> Any:
+        """Return loader() result, cached for domain_cache_ttl seconds."""
+        now = time.monotonic()
+        entry = self._domain_cache.get(key)
+        if entry is not None and now - entry[0] < self.domain_cache_ttl:
+            return entry[1]
+
+        value = loader()
+        self._domain_cache[key] = (now, value)
+        return value
+
+    def invalidate_domain_cache(self):
+        """Drop cached domain discovery results."""
+        self._domain_cache.clear()
 
     def get_domain_from_config(self) -> Optional[str]:
-        """Get domain from various sources, prioritizing 3x-ui database."""
+        """Get domain from various sources, prioritizing 3x-ui configuration."""
+        return self._cached("domain", self._find_domain_from_config)
+
+    def get_domains_from_3xui(self) -> list:
+        """Get all domains configured in 3x-ui database."""
+        return list(self._cached("xui_domains", self._read_domains_from_3xui))
+
+    def get_all_domains(self) -> list:
+        """Get all domains with Let's Encrypt certificates."""
+        return list(self._cached("all_domains", self._scan_all_domains))
+
+    def _find_domain_from_config(self) -> Optional[str]:
+        """Look up domain in the 3x-ui database, config.json, Nginx and Let's Encrypt."""
         domain = None
 
-        # Try to get from 3x-ui database (primary source)
+        # Try to get from 3x-ui database: the live settings x-ui actually serves
         try:
-            if os.path.exists(self.xui_db_path):
-                conn = sqlite3.connect(self.xui_db_path)
-                cursor = conn.cursor()
-
-                # Check all relevant settings
-                cursor.execute("""
-                    SELECT key, value FROM settings
-                    WHERE key IN ('webCertFile', 'webKeyFile', 'webDomain', 'tgBotChatId', 'webListen')
-                    AND value IS NOT NULL AND value != ''
-                """)
-
-                settings = dict(cursor.fetchall())
-
-                # Priority 1: webDomain if set
-                if settings.get('webDomain'):
-                    domain = settings['webDomain']
-                    logger.info(f"Got domain from webDomain setting: {domain}")
-
-                # Priority 2: Extract from webCertFile path
-                if not domain and settings.get('webCertFile'):
-                    cert_file = settings['webCertFile']
-                    if '/letsencrypt/live/' in cert_file:
-                        parts = cert_file.split('/letsencrypt/live/')
-                        if len(parts) > 1:
-                            domain = parts[1].split('/')[0]
-                            logger.info(f"Got domain from webCertFile path: {domain}")
-
-                conn.close()
+            # Check all relevant settings (_get_conn raises if the database is missing)
+            with self._conn_lock:
+                settings = dict(self._get_conn().execute(_SETTINGS_SQL_ALL).fetchall())
+
+            # Priority 1: webDomain if set
+            if settings.get('webDomain'):
+                domain = settings['webDomain']
+                logger.info(f"Got domain from webDomain setting: {domain}")
+
+            # Priority 2: Extract from webCertFile path
+            if not domain and settings.get('webCertFile'):
+                cert_file = settings['webCertFile']
+                if '/letsencrypt/live/' in cert_file:
+                    parts = cert_file.split('/letsencrypt/live/')
+                    if len(parts) > 1:
+                        domain = parts[1].split('/')[0]
+                        logger.info(f"Got domain from webCertFile path: {domain}")
+        except FileNotFoundError:
+            pass
         except Exception as e:
             logger.error(f"Error reading domain from x-ui database: {e}")
 
-        # Try to get from 3x-ui config.json
+        # Fall back to config.json certDomain; it can go stale when the domain
+        # is changed in the panel, so it never overrides the database.
         if not domain:
             try:
-                if os.path.exists(self.xui_config_path):
-                    with open(self.xui_config_path, 'r') as f:
-                        config = json.load(f)
-                        if config.get('certDomain'):
-                            domain = config['certDomain']
-                            logger.info(f"Got domain from config.json: {domain}")
+                config = _read_json_file(self.xui_config_path)
+                if config.get('certDomain'):
+                    domain = config['certDomain']
+                    logger.info(f"Got domain from config.json: {domain}")
+            except FileNotFoundError:
+                pass
             except Exception as e:
                 logger.error(f"Error reading domain from x-ui config: {e}")
 
@@ -81,83 +354,96 @@ class SSLManager:
             if domain:
                 logger.info(f"Got domain from nginx config: {domain}")
 
-        # Try to get from Let's Encrypt directory
+        # Try to get from Let's Encrypt directory (first domain that has a certificate)
         if not domain:
             try:
-                if os.path.exists(self.letsencrypt_base):
-                    domains = [d for d in os.listdir(self.letsencrypt_base)
-                              if os.path.isdir(os.path.join(self.letsencrypt_base, d))]
-                    if domains:
-                        domain = domains[0]
-                        logger.info(f"Got domain from letsencrypt directory: {domain}")
+                domain = next((d for d, _, _ in self._iter_le_domains()), None)
+                if domain:
+                    logger.info(f"Got domain from letsencrypt directory: {domain}")
             except Exception as e:
                 logger.error(f"Error reading from letsencrypt directory: {e}")
 
         return domain
 
-    def get_domains_from_3xui(self) -> list:
-        """Get all domains configured in 3x-ui database."""
+    def _read_domains_from_3xui(self) -> list:
+        """Read domains from 3x-ui settings and inbound SNI configurations."""
         domains = set()
 
         try:
-            if os.path.exists(self.xui_db_path):
-                conn = sqlite3.connect(self.xui_db_path)
-                cursor = conn.cursor()
+            # _get_conn raises if the database is missing
+            with self._conn_lock:
+                conn = self._get_conn()
 
                 # Get from settings
-                cursor.execute("""
-                    SELECT key, value FROM settings
-                    WHERE key IN ('webCertFile', 'webKeyFile', 'webDomain')
-                    AND value IS NOT NULL AND value != ''
-                """)
-
-                for key, value in cursor.fetchall():
-                    if key == 'webDomain' and value:
-                        domains.add(value)
-                    elif key in ('webCertFile', 'webKeyFile') and '/letsencrypt/live/' in value:
-                        parts = value.split('/letsencrypt/live/')
-                        if len(parts) > 1:
-                            domains.add(parts[1].split('/')[0])
-
-                # Also check inbounds for SNI domains
-                cursor.execute("SELECT stream_settings FROM inbounds WHERE stream_settings IS NOT NULL")
-                for (stream_settings,) in cursor.fetchall():
-                    try:
-                        settings = json.loads(stream_settings)
-                        # Check reality settings
-                        if 'realitySettings' in settings:
-                            sni = settings['realitySettings'].get('serverNames', [])
-                            for s in sni:
-                                if s and '.' in s:
-                                    domains.add(s)
-                        # Check TLS settings
-                        if 'tlsSettings' in settings:
-                            sni = settings['tlsSettings'].get('serverName', '')
-                            if sni and '.' in sni:
-                                domains.add(sni)
-                    except:
-                        pass
-
-                conn.close()
+                settings_rows = conn.execute(_SETTINGS_SQL_BASIC).fetchall()
+
+                # Also check inbounds for SNI domains, extracted by SQLite JSON1
+                try:
+                    sni_rows = conn.execute(_INBOUND_SNI_SQL).fetchall()
+                    inbound_rows = []
+                except sqlite3.OperationalError:
+                    # SQLite built without JSON1: parse stream settings in Python
+                    sni_rows = []
+                    inbound_rows = conn.execute(_INBOUND_STREAM_SQL).fetchall()
+
+            for key, value in settings_rows:
+                if key == 'webDomain' and value:
+                    domains.add(value)
+                elif key in ('webCertFile', 'webKeyFile') and '/letsencrypt/live/' in value:
+                    parts = value.split('/letsencrypt/live/')
+                    if len(parts) > 1:
+                        domains.add(parts[1].split('/')[0])
+
+            domains.update(sni for (sni,) in sni_rows)
+
+            for (stream_settings,) in inbound_rows:
+                try:
+                    settings = json.loads(stream_settings)
+                    # Check reality settings
+                    if 'realitySettings' in settings:
+                        sni = settings['realitySettings'].get('serverNames', [])
+                        for s in sni:
+                            if s and '.' in s:
+                                domains.add(s)
+                    # Check TLS settings
+                    if 'tlsSettings' in settings:
+                        sni = settings['tlsSettings'].get('serverName', '')
+                        if sni and '.' in sni:
+                            domains.add(sni)
+                except:
+                    pass
+
+        except FileNotFoundError:
+            pass
         except Exception as e:
             logger.error(f"Error getting domains from 3x-ui: {e}")
 
         return list(domains)
 
-    def get_all_domains(self) -> list:
-        """Get all domains with Let's Encrypt certificates."""
-        domains = []
+    def _iter_le_domains(self) -> Iterator[Tuple[str, str, os.stat_result]]:
+        """Yield (domain, fullchain.pem path, its stat) for Let's Encrypt domains with certificates."""
+        try:
+            entries = os.scandir(self.letsencrypt_base)
+        except FileNotFoundError:
+            return
+
+        with entries:
+            for entry in entries:
+                # d_type from scandir; live/ also holds a README file
+                if not entry.is_dir():
+                    continue
+                cert_path = _paths_for(self.letsencrypt_base, entry.name)[0]
+                st = _stat_or_none(cert_path)
+                if st is not None:
+                    yield entry.name, cert_path, st
+
+    def _scan_all_domains(self) -> list:
+        """Scan Let's Encrypt directory for domains with certificates."""
         try:
-            if os.path.exists(self.letsencrypt_base):
-                for d in os.listdir(self.letsencrypt_base):
-                    cert_dir = os.path.join(self.letsencrypt_base, d)
-                    if os.path.isdir(cert_dir):
-                        # Check if it has certificate files
-                        if os.path.exists(os.path.join(cert_dir, "fullchain.pem")):
-                            domains.append(d)
+            return [domain for domain, _, _ in self._iter_le_domains()]
         except Exception as e:
             logger.error(f"Error getting all domains: {e}")
-        return domains
+            return []
 
     def _get_domain_from_nginx(self) -> Optional[str]:
         """Extract domain from Nginx configuration."""
@@ -168,22 +454,24 @@ class SSLManager:
         ]
 
         for nginx_dir in nginx_paths:
-            if not os.path.exists(nginx_dir):
-                continue
-
             try:
-                for filename in os.listdir(nginx_dir):
-                    filepath = os.path.join(nginx_dir, filename)
-                    if os.path.isfile(filepath):
-                        with open(filepath, 'r') as f:
-                            content = f.read()
-                            # Look for server_name directive
-                            import re
-                            match = re.search(r'server_name\s+([^\s;]+)', content)
-                            if match:
-                                domain = match.group(1)
-                                if domain and domain != '_' and domain != 'localhost':
-                                    return domain
+                # No exists() probe: a missing directory just raises
+                with os.scandir(nginx_dir) as entries:
+                    for entry in entries:
+                        if entry.is_file():
+                            with open(entry.path, 'rb') as f:
+                                for line in f:
+                                    # Cheap substring check before running the regex
+                                    if b'server_name' not in line:
+                                        continue
+                                    # Look for server_name directive
+                                    match = _SERVER_NAME_RE.search(line)
+                                    if match:
+                                        domain = match.group(1).decode(errors='replace')
+                                        if domain and domain != '_' and domain != 'localhost':
+                                            return domain
+            except FileNotFoundError:
+                continue
             except Exception as e:
                 logger.error(f"Error reading nginx config {nginx_dir}: {e}")
 
@@ -201,49 +489,10 @@ class SSLManager:
                 "has_certificate": False
             }
 
-        cert_path = os.path.join(self.letsencrypt_base, domain, "fullchain.pem")
-        key_path = os.path.join(self.letsencrypt_base, domain, "privkey.pem")
-
-        if not os.path.exists(cert_path):
-            return {
-                "status": "not_found",
-                "domain": domain,
-                "has_certificate": False,
-                "message": f"Certificate not found at {cert_path}"
-            }
+        cert_path, key_path = _paths_for(self.letsencrypt_base, domain)
 
         try:
-            # Read certificate details using openssl
-            result = subprocess.run(
-                ['openssl', 'x509', '-in', cert_path, '-noout', '-dates', '-subject'],
-                capture_output=True,
-                text=True
-            )
-
-            if result.returncode != 0:
-                return {
-                    "status": "error",
-                    "domain": domain,
-                    "has_certificate": True,
-                    "message": f"Error reading certificate: {result.stderr}"
-                }
-
-            output = result.stdout
-
-            # Parse dates
-            not_before = None
-            not_after = None
-            subject = None
-
-            for line in output.split('\n'):
-                if 'notBefore=' in line:
-                    date_str = line.split('=')[1].strip()
-                    not_before = self._parse_openssl_date(date_str)
-                elif 'notAfter=' in line:
-                    date_str = line.split('=')[1].strip()
-                    not_after = self._parse_openssl_date(date_str)
-                elif 'subject=' in line:
-                    subject = line.split('=', 1)[1].strip()
+            not_before, not_after, subject = self._read_certificate_cached(cert_path)
 
             # Calculate days until expiry
             days_until_expiry = None
@@ -251,8 +500,7 @@ class SSLManager:
             needs_renewal = False
 
             if not_after:
-                now = datetime.utcnow()
-                days_until_expiry = (not_after - now).days
+                days_until_expiry = (not_after - datetime.now(timezone.utc)).days
                 is_expired = days_until_expiry < 0
                 needs_renewal = days_until_expiry < self.renewal_threshold_days
 
@@ -270,6 +518,13 @@ class SSLManager:
                 "subject": subject
             }
 
+        except FileNotFoundError:
+            return {
+                "status": "not_found",
+                "domain": domain,
+                "has_certificate": False,
+                "message": f"Certificate not found at {cert_path}"
+            }
         except Exception as e:
             logger.error(f"Error getting certificate info: {e}")
             return {
@@ -279,20 +534,90 @@ class SSLManager:
                 "message": str(e)
             }
 
-    def _parse_openssl_date(self, date_str: str) -> Optional[datetime]:
+    def get_all_certificate_info(self) -> Dict[str, Dict[str, Any]]:
+        """Get certificate information for all Let's Encrypt domains in parallel."""
+        domains = self.get_all_domains()
+        if not domains:
+            return {}
+
+        with ThreadPoolExecutor(max_workers=min(8, len(domains))) as executor:
+            return dict(zip(domains, executor.map(self.get_certificate_info, domains)))
+
+    def _read_certificate_cached(self, cert_path: str) -> Tuple[Optional[datetime], Optional[datetime], Optional[str]]:
+        """Read certificate, reusing the last parse while the file is unchanged."""
+        # fullchain.pem is a symlink certbot repoints on renewal; stat follows it
+        st = os.stat(cert_path)
+        # Size catches in-place rewrites within the filesystem's mtime granularity
+        file_key = (st.st_ino, st.st_mtime_ns, st.st_size)
+
+        cached = self._cert_cache.get(cert_path)
+        if cached is not None and cached[0] == file_key:
+            return cached[1]
+
+        parsed = self._read_certificate(cert_path)
+        self._cert_cache[cert_path] = (file_key, parsed)
+        return parsed
+
+    def _read_certificate(self, cert_path: str) -> Tuple[Optional[datetime], Optional[datetime], Optional[str]]:
+        """Read validity dates (aware UTC) and subject from a PEM certificate."""
+        if x509 is not None:
+            with open(cert_path, 'rb') as f:
+                cert = x509.load_pem_x509_certificate(f.read())
+
+            if hasattr(cert, 'not_valid_after_utc'):
+                not_before = cert.not_valid_before_utc
+                not_after = cert.not_valid_after_utc
+            else:
+                # cryptography < 42 returns naive UTC datetimes
+                not_before = cert.not_valid_before.replace(tzinfo=timezone.utc)
+                not_after = cert.not_valid_after.replace(tzinfo=timezone.utc)
+
+            return not_before, not_after, cert.subject.rfc4514_string()
+
+        # Fallback: read certificate details using openssl
+        result = subprocess.run(
+            ['openssl', 'x509', '-in', cert_path, '-noout', '-dates', '-subject'],
+            capture_output=True,
+            text=True
+        )
+
+        if result.returncode != 0:
+            raise RuntimeError(f"Error reading certificate: {result.stderr}")
+
+        fields = dict(_OPENSSL_FIELD_RE.findall(result.stdout))
+        not_before = fields.get('notBefore')
+        not_after = fields.get('notAfter')
+        subject = fields.get('subject')
+
+        return (
+            self._parse_openssl_date(not_before.strip()) if not_before else None,
+            self._parse_openssl_date(not_after.strip()) if not_after else None,
+            subject.strip() if subject else None,
+        )
+
+    @staticmethod
+    @functools.lru_cache(maxsize=256)
+    def _parse_openssl_date(date_str: str) -> Optional[datetime]:
         """Parse OpenSSL date format."""
+        # Format: "Dec 23 12:00:00 2024 GMT"; split() also handles the padded "Dec  3 ..."
         try:
-            # Format: "Dec 23 12:00:00 2024 GMT"
-            return datetime.strptime(date_str, "%b %d %H:%M:%S %Y %Z")
-        except ValueError:
-            try:
-                # Alternative format
-                return datetime.strptime(date_str, "%b  %d %H:%M:%S %Y %Z")
-            except ValueError:
-                return None
+            month, day, clock, year = date_str.split()[:4]
+            hour, minute, second = clock.split(':')
+            return datetime(int(year), _OPENSSL_MONTHS[month], int(day), int(hour), int(minute), int(second),
+                            tzinfo=timezone.utc)
+        except (ValueError, KeyError):
+            return None
+
+    def renew_certificate(self, domain: Optional[str] = None, force: bool = False, domains: Optional[list] = None,
+                          cert_info: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Renew SSL certificate using certbot.
 
-    def renew_certificate(self, domain: Optional[str] = None, force: bool = False, domains: Optional[list] = None) -> Dict[str, Any]:
-        """Renew SSL certificate using certbot with standalone mode."""
+        Uses webroot mode through the running nginx when possible and falls
+        back to standalone mode (nginx stopped) for domains that fail.
+
+        cert_info may be passed by callers that already fetched it for domain.
+        """
         if not domain:
             domain = self.get_domain_from_config()
 
@@ -303,7 +628,8 @@ class SSLManager:
             }
 
         # Check current certificate status
-        cert_info = self.get_certificate_info(domain)
+        if cert_info is None:
+            cert_info = self.get_certificate_info(domain)
 
         if cert_info.get("has_certificate") and not cert_info.get("needs_renewal") and not force:
             return {
@@ -315,87 +641,128 @@ class SSLManager:
 
         try:
             # Check if certbot is installed
-            certbot_check = subprocess.run(['which', 'certbot'], capture_output=True)
-            if certbot_check.returncode != 0:
+            if self._certbot_path is None:
+                self._certbot_path = shutil.which('certbot')
+            if self._certbot_path is None:
                 return {
                     "success": False,
                     "message": "certbot is not installed. Please install it with: apt install certbot"
                 }
 
-            # Stop nginx for standalone mode
-            logger.info("Stopping nginx for certificate renewal...")
-            nginx_stop = subprocess.run(['systemctl', 'stop', 'nginx'], capture_output=True, text=True)
-            if nginx_stop.returncode != 0:
-                logger.warning(f"Failed to stop nginx: {nginx_stop.stderr}")
-
-            results = []
             domains_to_renew = domains if domains else [domain]
-
-            for d in domains_to_renew:
-                # Use standalone mode for renewal
-                cmd = [
-                    'certbot', 'certonly',
-                    '--standalone',
-                    '-d', d,
-                    '--non-interactive',
-                    '--agree-tos',
-                    '--register-unsafely-without-email'
-                ]
-                if force:
-                    cmd.append('--force-renewal')
-
-                logger.info(f"Running certbot command: {' '.join(cmd)}")
-
-                result = subprocess.run(
-                    cmd,
-                    capture_output=True,
-                    text=True,
-                    timeout=120
-                )
-
-                results.append({
-                    "domain": d,
-                    "success": result.returncode == 0,
-                    "output": result.stdout,
-                    "error": result.stderr if result.returncode != 0 else None
-                })
-
-            # Start nginx back
-            logger.info("Starting nginx...")
-            nginx_start = subprocess.run(['systemctl', 'start', 'nginx'], capture_output=True, text=True)
-            if nginx_start.returncode != 0:
-                logger.error(f"Failed to start nginx: {nginx_start.stderr}")
+            results_by_domain: Dict[str, Dict[str, Any]] = {}
+
+            # Renewals run one at a time: certbot holds a global lock on its
+            # config dir and --standalone binds port 80 for the HTTP-01 challenge,
+            # so concurrent invocations would fail rather than overlap.
+
+            # Try webroot first: the running nginx serves the challenge, no downtime
+            if self._webroot_available():
+                for d in domains_to_renew:
+                    results_by_domain[d] = self._run_certbot(d, force, webroot=self.webroot_path)
+                    if not results_by_domain[d]["success"]:
+                        logger.warning(f"Webroot renewal failed for {d}, retrying in standalone mode")
+
+            standalone_domains = [
+                d for d in domains_to_renew
+                if not results_by_domain.get(d, {}).get("success")
+            ]
+            if standalone_domains:
+                # Stop nginx for standalone mode
+                logger.info("Stopping nginx for certificate renewal...")
+                stopped, error = self._systemctl('stop', 'nginx')
+                if not stopped:
+                    logger.warning(f"Failed to stop nginx: {error}")
+
+                for d in standalone_domains:
+                    results_by_domain[d] = self._run_certbot(d, force)
+
+                # Start nginx back
+                logger.info("Starting nginx...")
+                started, error = self._systemctl('start', 'nginx')
+                if not started:
+                    logger.error(f"Failed to start nginx: {error}")
+
+            results = [results_by_domain[d] for d in domains_to_renew]
+
+            # certbot may have created new live/ directories
+            self.invalidate_domain_cache()
 
             # Check results
             all_success = all(r["success"] for r in results)
+            renewed = any(r["success"] for r in results)
 
-            # Get updated certificate info
-            new_cert_info = self.get_certificate_info(domain)
+            # Get updated certificate info (unchanged if no certbot run succeeded)
+            new_cert_info = self.get_certificate_info(domain) if renewed else cert_info
 
             return {
                 "success": all_success,
                 "message": f"Certificate renewal {'completed' if all_success else 'partially failed'}",
-                "renewed": any(r["success"] for r in results),
+                "renewed": renewed,
                 "cert_info": new_cert_info,
                 "results": results
             }
 
         except subprocess.TimeoutExpired:
             # Make sure to start nginx back
-            subprocess.run(['systemctl', 'start', 'nginx'], capture_output=True)
+            self._systemctl('start', 'nginx')
             return {
                 "success": False,
                 "message": "certbot command timed out after 120 seconds"
             }
         except Exception as e:
             # Make sure to start nginx back
-            subprocess.run(['systemctl', 'start', 'nginx'], capture_output=True)
+            self._systemctl('start', 'nginx')
             logger.error(f"Error renewing certificate: {e}")
             return {
                 "success": False,
                 "message": str(e)
             }
 
+    def _webroot_available(self) -> bool:
+        """Check whether certbot can use webroot mode via the running nginx."""
+        if self.use_standalone or not os.path.isdir(self.webroot_path):
+            return False
+        if shutil.which('nginx') is None:
+            return False
+        nginx_active = subprocess.run(['systemctl', 'is-active', '--quiet', 'nginx'])
+        return nginx_active.returncode == 0
+
+    def _run_certbot(self, domain: str, force: bool = False, webroot: Optional[str] = None) -> Dict[str, Any]:
+        """Obtain or renew certificate for a single domain with certbot."""
+        # Webroot mode if a webroot is given, otherwise standalone mode
+        if webroot:
+            authenticator = ['--webroot', '-w', webroot]
+        else:
+            authenticator = ['--standalone']
+
+        cmd = [
+            self._certbot_path or 'certbot', 'certonly',
+            *authenticator,
+            '-d', domain,
+            '--non-interactive',
+            '--agree-tos',
+            '--register-unsafely-without-email'
+        ]
+        if force:
+            cmd.append('--force-renewal')
+
+        logger.info(f"Running certbot command: {' '.join(cmd)}")
+
+        result = subprocess.run(
+            cmd,
+            capture_output=True,
+            text=True,
+            timeout=120
+        )
+
+        return {
+            "domain": domain,
+            "success": result.returncode == 0,
+            "output": result.stdout,
+            "error": result.stderr if result.returncode != 0 else None
+        }
+
     def update_3xui_certificate(self, domain: Optional[str] = None) -> Dict[str, Any]:
         """Update 3x-ui panel to use the new certificate."""
         if not domain:
@@ -407,51 +774,54 @@ class SSLManager:
                 "message": "Domain not found"
             }
 
-        cert_path = os.path.join(self.letsencrypt_base, domain, "fullchain.pem")
-        key_path = os.path.join(self.letsencrypt_base, domain, "privkey.pem")
+        cert_path, key_path = _paths_for(self.letsencrypt_base, domain)
 
-        if not os.path.exists(cert_path) or not os.path.exists(key_path):
+        # Key is only checked when the certificate exists
+        if _stat_or_none(cert_path) is None or _stat_or_none(key_path) is None:
             return {
                 "success": False,
                 "message": f"Certificate files not found for domain {domain}"
             }
 
         try:
-            # Update 3x-ui database settings
-            if os.path.exists(self.xui_db_path):
-                conn = sqlite3.connect(self.xui_db_path)
-                cursor = conn.cursor()
-
-                # Update certificate paths in settings
-                settings_to_update = [
-                    ('webCertFile', cert_path),
-                    ('webKeyFile', key_path),
-                    ('webDomain', domain)
-                ]
-
-                for key, value in settings_to_update:
-                    cursor.execute("""
-                        INSERT OR REPLACE INTO settings (key, value)
-                        VALUES (?, ?)
-                    """, (key, value))
-
-                conn.commit()
-                conn.close()
+            # Update certificate paths in 3x-ui database settings
+            settings_to_update = [
+                ('webCertFile', cert_path),
+                ('webKeyFile', key_path),
+                ('webDomain', domain)
+            ]
 
+            try:
+                # _get_conn raises FileNotFoundError if the database is missing
+                with self._conn_lock:
+                    conn = self._get_conn()
+                    # One transaction for all three rows instead of one per row
+                    conn.execute("BEGIN IMMEDIATE")
+                    try:
+                        conn.executemany(_SETTINGS_UPSERT_SQL, settings_to_update)
+                        conn.execute("COMMIT")
+                    except Exception:
+                        conn.execute("ROLLBACK")
+                        raise
+            except FileNotFoundError:
+                pass
+            else:
+                self.invalidate_domain_cache()
+                # Domain lookup would resolve to this via webDomain (and certDomain below)
+                self._domain_cache["domain"] = (time.monotonic(), domain)
                 logger.info(f"Updated 3x-ui database with certificate paths for {domain}")
 
             # Update 3x-ui config.json if it exists
             if os.path.exists(self.xui_config_path):
                 try:
-                    with open(self.xui_config_path, 'r') as f:
-                        config = json.load(f)
+                    config = _read_json_file(self.xui_config_path)
 
                     config['certFile'] = cert_path
                     config['keyFile'] = key_path
                     config['certDomain'] = domain
 
-                    with open(self.xui_config_path, 'w') as f:
-                        json.dump(config, f, indent=2)
+                    # Written via temp file + rename so x-ui never reads a partial file
+                    _write_json_file(self.xui_config_path, config)
 
                     logger.info(f"Updated 3x-ui config.json with certificate paths")
                 except Exception as e:
@@ -479,47 +849,15 @@ class SSLManager:
             "xui-manager": {"success": False, "message": ""}
         }
 
-        # Restart Nginx
-        try:
-            # Test nginx config first
-            test_result = subprocess.run(
-                ['nginx', '-t'],
-                capture_output=True,
-                text=True
-            )
-
-            if test_result.returncode != 0:
-                results["nginx"]["message"] = f"Nginx config test failed: {test_result.stderr}"
-            else:
-                reload_result = subprocess.run(
-                    ['systemctl', 'reload', 'nginx'],
-                    capture_output=True,
-                    text=True
-                )
-
-                if reload_result.returncode == 0:
-                    results["nginx"]["success"] = True
-                    results["nginx"]["message"] = "Nginx reloaded successfully"
-                else:
-                    results["nginx"]["message"] = f"Failed to reload nginx: {reload_result.stderr}"
-        except Exception as e:
-            results["nginx"]["message"] = str(e)
-
-        # Restart 3x-ui
-        try:
-            restart_result = subprocess.run(
-                ['systemctl', 'restart', 'x-ui'],
-                capture_output=True,
-                text=True
-            )
-
-            if restart_result.returncode == 0:
-                results["x-ui"]["success"] = True
-                results["x-ui"]["message"] = "x-ui restarted successfully"
-            else:
-                results["x-ui"]["message"] = f"Failed to restart x-ui: {restart_result.stderr}"
-        except Exception as e:
-            results["x-ui"]["message"] = str(e)
+        # The two services are independent, so reload nginx while x-ui restarts
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            nginx_future = executor.submit(self._reload_nginx)
+            xui_future = executor.submit(self._restart_xui)
+            for name, future in (("nginx", nginx_future), ("x-ui", xui_future)):
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    results[name]["message"] = str(e)
 
         # Note: xui-manager restart should be handled separately to avoid killing the current process
         results["xui-manager"]["success"] = True
@@ -527,17 +865,45 @@ class SSLManager:
 
         return results
 
-    def full_certificate_renewal(self, domain: Optional[str] = None, force: bool = False, domains: Optional[list] = None) -> Dict[str, Any]:
+    def _reload_nginx(self) -> Dict[str, Any]:
+        """Test Nginx config and reload it."""
+        # Test nginx config first
+        config_ok, test_error = self._nginx_config_ok()
+        if not config_ok:
+            return {"success": False, "message": f"Nginx config test failed: {test_error}"}
+
+        reloaded, reload_error = self._systemctl('reload', 'nginx')
+        if reloaded:
+            return {"success": True, "message": "Nginx reloaded successfully"}
+        return {"success": False, "message": f"Failed to reload nginx: {reload_error}"}
+
+    def _restart_xui(self) -> Dict[str, Any]:
+        """Restart 3x-ui service."""
+        restarted, restart_error = self._systemctl('restart', 'x-ui')
+        if restarted:
+            return {"success": True, "message": "x-ui restarted successfully"}
+        return {"success": False, "message": f"Failed to restart x-ui: {restart_error}"}
+
+    def full_certificate_renewal(self, domain: Optional[str] = None, force: bool = False, domains: Optional[list] = None,
+                                 cert_info: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Complete certificate renewal process:
-        1. Renew certificate with certbot (standalone mode)
+        1. Renew certificate with certbot (webroot, or standalone as fallback)
         2. Update 3x-ui configuration
         3. Restart services
+
+        Renewals are serialized; a call waits for one already in progress.
         """
+        with self._renewal_lock:
+            return self._full_certificate_renewal(domain, force, domains, cert_info)
+
+    def _full_certificate_renewal(self, domain: Optional[str], force: bool, domains: Optional[list],
+                                  cert_info: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Run renewal steps. Caller must hold _renewal_lock."""
         steps = []
 
         # Step 1: Renew certificate
-        renewal_result = self.renew_certificate(domain, force, domains)
+        renewal_result = self.renew_certificate(domain, force, domains, cert_info)
         steps.append({
             "step": "renew_certificate",
             "result": renewal_result
@@ -586,6 +952,9 @@ class SSLManager:
         """
         Check certificate status and auto-renew if needed.
         This is called on application startup.
+
+        Renewal (certbot + service restarts) runs in a background thread,
+        so this returns as soon as the certificate has been checked.
         """
         domain = self.get_domain_from_config()
 
@@ -609,15 +978,28 @@ class SSLManager:
         if cert_info.get("is_expired") or cert_info.get("needs_renewal"):
             logger.info(f"Certificate needs renewal (days left: {cert_info.get('days_until_expiry')})")
 
-            # Perform full renewal
-            renewal_result = self.full_certificate_renewal(domain, force=False)
+            if self._renewal_lock.locked():
+                return {
+                    "checked": True,
+                    "renewed": False,
+                    "message": "Certificate renewal already in progress",
+                    "cert_info": cert_info
+                }
+
+            # Perform full renewal in the background
+            threading.Thread(
+                target=self._auto_renew,
+                args=(domain, cert_info),
+                name="ssl-auto-renew",
+                daemon=True
+            ).start()
 
             return {
                 "checked": True,
-                "renewed": renewal_result.get("renewed", False),
-                "message": "Auto-renewal performed" if renewal_result.get("renewed") else "Renewal not needed",
-                "cert_info": cert_info,
-                "renewal_result": renewal_result
+                "renewed": False,
+                "scheduled": True,
+                "message": f"Auto-renewal scheduled for {domain}",
+                "cert_info": cert_info
             }
 
         return {
@@ -627,6 +1009,17 @@ class SSLManager:
             "cert_info": cert_info
         }
 
+    def _auto_renew(self, domain: str, cert_info: Dict[str, Any]):
+        """Background auto-renewal started by check_and_auto_renew."""
+        try:
+            renewal_result = self.full_certificate_renewal(domain, force=False, cert_info=cert_info)
+            if renewal_result.get("renewed"):
+                logger.info(f"SSL certificate auto-renewed for {domain}")
+            elif not renewal_result.get("success"):
+                logger.error(f"SSL auto-renewal failed for {domain}: {renewal_result.get('message')}")
+        except Exception as e:
+            logger.error(f"SSL auto-renewal failed for {domain}: {e}")
+
 
 # Global instance
 ssl_manager = SSLManager()
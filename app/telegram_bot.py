@@ -8,14 +8,36 @@ import asyncio
 import json
 import logging
 import os
+import threading
 import time
+from collections import OrderedDict
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple, Any
 from dataclasses import dataclass, field
 from enum import Enum
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
+
+def _json_dumps(data: Any) -> bytes:
+    """Serialize to JSON bytes, using orjson when available"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data).encode()
+
+
+def _json_loads(data: bytes) -> Any:
+    """Parse JSON bytes, using orjson when available"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
 # Try to import aiogram, but make it optional
 try:
     from aiogram import Bot, Dispatcher, types
@@ -175,9 +197,101 @@ ALERT_CONFIGS: Dict[str, AlertConfig] = {
 }
 
 
+# Telegram Bot API limits: ~30 messages/s per bot, 1/s per chat, 20/min per group
+TELEGRAM_GLOBAL_RATE = (30, 1.0)
+TELEGRAM_CHAT_RATE = (1, 1.0)
+TELEGRAM_GROUP_RATE = (20, 60.0)
+
+# Maximum sendMessage text length
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+
+class _TokenBucket:
+    """Async token bucket: at most `rate` acquisitions per `period` seconds"""
+
+    def __init__(self, rate: int, period: float):
+        self.rate = rate
+        self.period = period
+        self._tokens = float(rate)
+        self._updated = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None  # Created inside the event loop
+
+    async def acquire(self):
+        """Wait until a token is available and take it"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate / self.period)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) * self.period / self.rate)
+
+
+# Message templates (str.format fields filled per send)
+SERVER_STATUS_TEMPLATE = """📊 <b>Статус сервера</b>
+
+🖥 <b>CPU:</b> {cpu:.1f}%
+💾 <b>Память:</b> {mem_percent:.1f}%
+⚡ <b>Xray:</b> {xray_status}
+👥 <b>Онлайн:</b> {online_users}
+📅 <b>Uptime:</b> {uptime}
+
+<i>{timestamp}</i>"""
+
+DAILY_REPORT_TEMPLATE = """📈 <b>Ежедневный отчёт</b>
+
+👥 <b>Всего пользователей:</b> {total_users}
+✅ <b>Активных:</b> {active_users}
+❌ <b>Отключенных:</b> {disabled_users}
+⏰ <b>Истекающих (7 дней):</b> {expiring_soon}
+
+📊 <b>Трафик за сегодня:</b>
+↑ Upload: {today_upload}
+↓ Download: {today_download}
+
+📊 <b>Трафик всего:</b>
+↑ Upload: {total_upload}
+↓ Download: {total_download}
+
+<i>{timestamp}</i>"""
+
+# Last formatted message timestamp: (unix second, "YYYY-mm-dd HH:MM:SS")
+_timestamp_cache = (0, "")
+
+
+def _now_str() -> str:
+    """Current local time for message footers, formatted at most once per second"""
+    global _timestamp_cache
+    now = int(time.time())
+    if _timestamp_cache[0] != now:
+        _timestamp_cache = (now, datetime.fromtimestamp(now).strftime("%Y-%m-%d %H:%M:%S"))
+    return _timestamp_cache[1]
+
+
+# Cooldown in seconds of each enabled alert type, keyed by plain type string
+ALERT_COOLDOWNS: Dict[str, int] = {
+    alert_type.value: config.cooldown_minutes * 60
+    for alert_type, config in ALERT_CONFIGS.items()
+    if config.enabled
+}
+
+# History entries older than this no longer affect any cooldown and are dropped on compaction
+ALERT_HISTORY_RETENTION = 2 * max(config.cooldown_minutes for config in ALERT_CONFIGS.values()) * 60
+
+
 class TelegramNotifier:
     """Telegram notification system with anti-spam protection"""
 
+    HISTORY_COMPACT_EVERY = 200  # Appended history lines between full rewrites
+    HISTORY_MAXLEN = 10000  # Most recently sent alert keys kept for cooldowns
+    ALERT_BATCH_DELAY = 0.5  # Seconds to collect alerts into one message
+    ALERT_BATCH_SEPARATOR = "\n\n———\n\n"
+
     def __init__(
         self,
         bot_token: str = "",
@@ -186,53 +300,186 @@ class TelegramNotifier:
         history_file: str = "/opt/xui-manager/alert_history.json"
     ):
         self.bot_token = bot_token
-        self.admin_ids = admin_ids or []
+        # Checked on every inbound bot command
+        self.admin_ids: FrozenSet[int] = frozenset(admin_ids or ())
         self.default_cooldown = cooldown_minutes
         self.history_file = history_file
-        self.alert_history: Dict[str, float] = {}
+        # Least recently sent first, so the oldest entry is evicted when full
+        self.alert_history: "OrderedDict[str, int]" = OrderedDict()
         self._bot: Optional[Any] = None
+        self._session: Optional[Any] = None  # aiohttp.ClientSession, created on first send
+        self._global_limiter = _TokenBucket(*TELEGRAM_GLOBAL_RATE)
+        self._chat_limiters: Dict[int, _TokenBucket] = {}
+
+        # History writes are coalesced: changed entries are appended at most once per flush interval
+        self._history_pending: Dict[str, int] = {}
+        self._history_appends = 0
+        self._history_flush_interval = 5.0
+        self._history_flush_task: Optional[asyncio.Task] = None
+        # Executor flushes and direct rewrites share the file and its .tmp; bumped
+        # by clear_alert_history so a flush taken before the clear is dropped
+        self._history_write_lock = threading.RLock()
+        self._history_generation = 0
+
+        # Alerts waiting for the next batched send: (alert type, alert key, formatted text)
+        self._outbox: List[Tuple[str, str, str]] = []
+        self._outbox_keys: Set[str] = set()
+        self._outbox_flush_task: Optional[asyncio.Task] = None
+
+        # Per alert type {"count", "last_sent"} over alert_history, kept up to date incrementally
+        self._stats_by_type: Dict[str, Dict[str, int]] = {}
 
         # Load alert history
         self._load_history()
 
     def _load_history(self):
-        """Load alert history from file"""
+        """Load alert history from file (one [key, timestamp] entry per line)"""
         try:
             if os.path.exists(self.history_file):
-                with open(self.history_file, 'r') as f:
-                    self.alert_history = json.load(f)
+                with open(self.history_file, 'rb') as f:
+                    for line in f:
+                        if not line.strip():
+                            continue
+                        try:
+                            data = _json_loads(line)
+                        except ValueError:
+                            # Torn last line after a crash
+                            continue
+                        if isinstance(data, dict):
+                            # Older versions stored the whole history as one JSON object
+                            for key, timestamp in data.items():
+                                self.alert_history[key] = int(timestamp)
+                        else:
+                            key, timestamp = data
+                            # Older versions stored float timestamps
+                            self.alert_history[key] = int(timestamp)
+
+                # Keep the most recent retained entries, oldest first
+                cutoff = int(time.time()) - ALERT_HISTORY_RETENTION
+                recent = sorted(
+                    ((k, ts) for k, ts in self.alert_history.items() if ts > cutoff),
+                    key=lambda item: item[1]
+                )
+                self.alert_history = OrderedDict(recent[-self.HISTORY_MAXLEN:])
+                self._save_history()
         except Exception as e:
             logger.error(f"Error loading alert history: {e}")
-            self.alert_history = {}
+            self.alert_history = OrderedDict()
+        self._rebuild_stats()
+
+    def _rebuild_stats(self):
+        """Recompute per-type alert statistics from alert_history"""
+        self._stats_by_type = {}
+        for key, timestamp in self.alert_history.items():
+            stats = self._stats_by_type.setdefault(key.split(":", 1)[0], {"count": 0, "last_sent": 0})
+            stats["count"] += 1
+            stats["last_sent"] = max(stats["last_sent"], timestamp)
+
+    def _save_history(self, history: Optional[Dict[str, int]] = None):
+        """Rewrite alert history file with all (or a snapshot of) retained entries"""
+        if history is None:
+            history = self.alert_history
+        try:
+            os.makedirs(os.path.dirname(self.history_file), exist_ok=True)
+            cutoff = int(time.time()) - ALERT_HISTORY_RETENTION
+            # Write to a temp file and rename so a crash never leaves a partial file
+            tmp_file = self.history_file + '.tmp'
+            with self._history_write_lock:
+                with open(tmp_file, 'wb') as f:
+                    f.writelines(_json_dumps([k, ts]) + b'\n' for k, ts in history.items() if ts > cutoff)
+                    # Data must be on disk before the rename, or a crash can leave an empty history
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_file, self.history_file)
+        except Exception as e:
+            logger.error(f"Error saving alert history: {e}")
 
-    def _save_history(self):
-        """Save alert history to file"""
+    def _append_history(self, entries: Dict[str, int]):
+        """Append changed history entries to file"""
         try:
             os.makedirs(os.path.dirname(self.history_file), exist_ok=True)
-            with open(self.history_file, 'w') as f:
-                json.dump(self.alert_history, f)
+            with self._history_write_lock, open(self.history_file, 'ab') as f:
+                f.writelines(_json_dumps([k, ts]) + b'\n' for k, ts in entries.items())
         except Exception as e:
             logger.error(f"Error saving alert history: {e}")
 
+    def _take_pending_history(self):
+        """
+        Take entries changed since the last flush.
+
+        Returns (pending entries, full snapshot or None, history generation);
+        the snapshot is set when the file is due for compaction instead of
+        another append.
+        """
+        pending, self._history_pending = self._history_pending, {}
+        self._history_appends += len(pending)
+        if self._history_appends >= self.HISTORY_COMPACT_EVERY:
+            self._history_appends = 0
+            return pending, dict(self.alert_history), self._history_generation
+        return pending, None, self._history_generation
+
+    def _write_history(self, pending: Dict[str, int], snapshot: Optional[Dict[str, int]], generation: int):
+        """Persist a flush taken by _take_pending_history"""
+        with self._history_write_lock:
+            if generation != self._history_generation:
+                # History was cleared after this flush was taken
+                return
+            if snapshot is not None:
+                self._save_history(snapshot)
+            elif pending:
+                self._append_history(pending)
+
+    async def _get_session(self):
+        """Get or create aiohttp session (keeps connections to api.telegram.org alive)"""
+        if self._session is None or self._session.closed:
+            import aiohttp
+
+            connector = aiohttp.TCPConnector(limit=32, ttl_dns_cache=300, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=10)
+            )
+        return self._session
+
+    async def close(self):
+        """Send queued alerts, flush pending alert history and close the HTTP session"""
+        if self._outbox_flush_task and not self._outbox_flush_task.done():
+            self._outbox_flush_task.cancel()
+        if self._outbox:
+            await self._flush_alerts()
+
+        if self._history_flush_task and not self._history_flush_task.done():
+            self._history_flush_task.cancel()
+        if self._history_pending:
+            self._write_history(*self._take_pending_history())
+
+        if self._session and not self._session.closed:
+            await self._session.close()
+
     def is_configured(self) -> bool:
         """Check if Telegram is properly configured"""
         return bool(self.bot_token and self.admin_ids)
 
     def _should_send_alert(self, alert_type: str, alert_key: str = "") -> bool:
         """Check if alert should be sent (anti-spam)"""
-        # Get alert config
-        config = ALERT_CONFIGS.get(alert_type)
-        if not config or not config.enabled:
+        # Unknown and disabled alert types have no cooldown entry
+        cooldown_seconds = ALERT_COOLDOWNS.get(alert_type)
+        if cooldown_seconds is None:
             return False
+        if cooldown_seconds == 0:
+            return True
 
         # Create unique key for this alert
         unique_key = f"{alert_type}:{alert_key}" if alert_key else alert_type
 
+        # Already queued for the next batch
+        if unique_key in self._outbox_keys:
+            return False
+
         # Check cooldown
         last_sent = self.alert_history.get(unique_key, 0)
-        cooldown_seconds = config.cooldown_minutes * 60
 
-        if time.time() - last_sent < cooldown_seconds:
+        if int(time.time()) - last_sent < cooldown_seconds:
             logger.debug(f"Alert {unique_key} suppressed (cooldown)")
             return False
 
@@ -241,8 +488,40 @@ class TelegramNotifier:
     def _mark_alert_sent(self, alert_type: str, alert_key: str = ""):
         """Mark alert as sent"""
         unique_key = f"{alert_type}:{alert_key}" if alert_key else alert_type
-        self.alert_history[unique_key] = time.time()
-        self._save_history()
+        now = int(time.time())
+        stats = self._stats_by_type.setdefault(alert_type, {"count": 0, "last_sent": 0})
+        if unique_key not in self.alert_history:
+            stats["count"] += 1
+        stats["last_sent"] = now
+
+        self.alert_history[unique_key] = self._history_pending[unique_key] = now
+        self.alert_history.move_to_end(unique_key)
+        if len(self.alert_history) > self.HISTORY_MAXLEN:
+            evicted_key, _ = self.alert_history.popitem(last=False)
+            evicted_type = evicted_key.split(":", 1)[0]
+            self._stats_by_type[evicted_type]["count"] -= 1
+            if not self._stats_by_type[evicted_type]["count"]:
+                del self._stats_by_type[evicted_type]
+        self._schedule_history_flush()
+
+    def _schedule_history_flush(self):
+        """Schedule a delayed background save of alert history"""
+        if self._history_flush_task and not self._history_flush_task.done():
+            return
+
+        try:
+            self._history_flush_task = asyncio.get_running_loop().create_task(self._flush_history_later())
+        except RuntimeError:
+            # No running event loop: save synchronously
+            self._write_history(*self._take_pending_history())
+
+    async def _flush_history_later(self):
+        """Save alert history after the flush interval, off the event loop"""
+        await asyncio.sleep(self._history_flush_interval)
+        if self._history_pending:
+            # Taken on the loop thread so the writer never sees the dicts mid-update
+            flush = self._take_pending_history()
+            await asyncio.get_running_loop().run_in_executor(None, self._write_history, *flush)
 
     async def send_message(self, text: str, chat_id: int = None, parse_mode: str = "HTML") -> bool:
         """Send message to Telegram chat"""
@@ -251,39 +530,77 @@ class TelegramNotifier:
             return False
 
         try:
-            import aiohttp
+            session = await self._get_session()
+            url = f"https://api.telegram.org/bot{self.bot_token}/sendMessage"
 
             targets = [chat_id] if chat_id else self.admin_ids
 
-            for target_id in targets:
-                url = f"https://api.telegram.org/bot{self.bot_token}/sendMessage"
-                payload = {
-                    "chat_id": target_id,
-                    "text": text,
-                    "parse_mode": parse_mode,
-                }
-
-                async with aiohttp.ClientSession() as session:
-                    async with session.post(url, json=payload, timeout=aiohttp.ClientTimeout(total=10)) as response:
-                        if response.status != 200:
-                            result = await response.text()
-                            logger.error(f"Telegram API error: {result}")
-                            return False
+            # Deliver to all targets concurrently; the connector limit caps parallelism
+            results = await asyncio.gather(
+                *(self._post_message(session, url, target_id, text, parse_mode) for target_id in targets),
+                return_exceptions=True
+            )
 
-            return True
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.error(f"Error sending Telegram message: {result}")
+
+            return all(result is True for result in results)
 
         except Exception as e:
             logger.error(f"Error sending Telegram message: {e}")
             return False
 
+    def _chat_limiter(self, chat_id: int) -> _TokenBucket:
+        """Get rate limiter for a chat (group chats have negative IDs)"""
+        limiter = self._chat_limiters.get(chat_id)
+        if limiter is None:
+            rate = TELEGRAM_GROUP_RATE if int(chat_id) < 0 else TELEGRAM_CHAT_RATE
+            limiter = self._chat_limiters[chat_id] = _TokenBucket(*rate)
+        return limiter
+
+    async def _post_message(self, session, url: str, chat_id: int, text: str, parse_mode: str) -> bool:
+        """POST a single sendMessage request, within Telegram rate limits"""
+        payload = {
+            "chat_id": chat_id,
+            "text": text,
+            "parse_mode": parse_mode,
+        }
+
+        for attempt in range(2):
+            await self._chat_limiter(chat_id).acquire()
+            await self._global_limiter.acquire()
+
+            async with session.post(url, json=payload) as response:
+                if response.status == 200:
+                    return True
+
+                if response.status == 429 and attempt == 0:
+                    # Flood control: wait as long as Telegram asks, then retry once
+                    try:
+                        result = await response.json(content_type=None)
+                        retry_after = float(result.get("parameters", {}).get("retry_after", 1))
+                    except Exception:
+                        retry_after = 1.0
+                    logger.warning(f"Telegram rate limit hit, retrying in {retry_after}s")
+                else:
+                    result = await response.text()
+                    logger.error(f"Telegram API error: {result}")
+                    return False
+
+            await asyncio.sleep(retry_after)
+
+        return False
+
     async def send_alert(
         self,
         alert_type: AlertType,
         message: str,
         alert_key: str = "",
         extra_data: Dict[str, Any] = None,
-        force: bool = False
-    ) -> bool:
+        force: bool = False,
+        immediate: bool = False
+    ) -> Optional[bool]:
         """
         Send alert with anti-spam protection
 
@@ -293,9 +610,16 @@ class TelegramNotifier:
             alert_key: Unique key for deduplication (e.g., user email)
             extra_data: Additional data to include
             force: Skip cooldown check
+            immediate: Send now instead of batching, and report delivery
+
+        Alerts raised within ALERT_BATCH_DELAY of each other are delivered
+        together as one message per admin. Delivery failures of batched
+        alerts are only logged.
 
         Returns:
-            True if alert was sent
+            False if the alert was not sent (not configured or in cooldown);
+            with immediate, whether it was delivered to all admins; otherwise
+            None, as it was only queued and delivery is not known yet
         """
         if not self.is_configured():
             return False
@@ -308,7 +632,7 @@ class TelegramNotifier:
         config = ALERT_CONFIGS.get(alert_type, ALERT_CONFIGS[AlertType.CUSTOM])
 
         # Format message
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        timestamp = _now_str()
         formatted_message = f"{config.emoji} <b>{config.title_ru}</b>\n\n"
         formatted_message += f"{message}\n\n"
 
@@ -318,13 +642,47 @@ class TelegramNotifier:
 
         formatted_message += f"\n<i>{timestamp}</i>"
 
-        # Send message
-        success = await self.send_message(formatted_message)
-
-        if success:
-            self._mark_alert_sent(alert_type.value, alert_key)
-
-        return success
+        if immediate:
+            sent = await self.send_message(formatted_message)
+            if sent:
+                self._mark_alert_sent(alert_type.value, alert_key)
+            return sent
+
+        # Queue message for the next batch
+        self._outbox.append((alert_type.value, alert_key, formatted_message))
+        self._outbox_keys.add(f"{alert_type.value}:{alert_key}" if alert_key else alert_type.value)
+        if self._outbox_flush_task is None or self._outbox_flush_task.done():
+            self._outbox_flush_task = asyncio.get_running_loop().create_task(self._flush_alerts_later())
+
+        return None
+
+    async def _flush_alerts_later(self):
+        """Send queued alerts after the batch delay"""
+        await asyncio.sleep(self.ALERT_BATCH_DELAY)
+        await self._flush_alerts()
+
+    async def _flush_alerts(self):
+        """Send queued alerts, joined into as few messages as the length limit allows"""
+        batch, self._outbox = self._outbox, []
+        self._outbox_keys.clear()
+
+        # Split into chunks of whole alerts that fit in one message
+        chunks: List[List[Tuple[str, str, str]]] = []
+        size = 0
+        for alert in batch:
+            length = len(alert[2])
+            if chunks and size + len(self.ALERT_BATCH_SEPARATOR) + length <= TELEGRAM_MESSAGE_LIMIT:
+                chunks[-1].append(alert)
+                size += len(self.ALERT_BATCH_SEPARATOR) + length
+            else:
+                chunks.append([alert])
+                size = length
+
+        for chunk in chunks:
+            text = self.ALERT_BATCH_SEPARATOR.join(alert[2] for alert in chunk)
+            if await self.send_message(text):
+                for alert_type, alert_key, _ in chunk:
+                    self._mark_alert_sent(alert_type, alert_key)
 
     async def send_server_status(self, status: Dict[str, Any]) -> bool:
         """Send server status summary"""
@@ -338,15 +696,14 @@ class TelegramNotifier:
 
         xray_status = "🟢 Running" if status.get("xray_running") else "🔴 Stopped"
 
-        message = f"""📊 <b>Статус сервера</b>
-
-🖥 <b>CPU:</b> {cpu:.1f}%
-💾 <b>Память:</b> {mem_percent:.1f}%
-⚡ <b>Xray:</b> {xray_status}
-👥 <b>Онлайн:</b> {status.get("online_users", 0)}
-📅 <b>Uptime:</b> {status.get("uptime", "N/A")}
-
-<i>{datetime.now().strftime("%Y-%m-%d %H:%M:%S")}</i>"""
+        message = SERVER_STATUS_TEMPLATE.format(
+            cpu=cpu,
+            mem_percent=mem_percent,
+            xray_status=xray_status,
+            online_users=status.get("online_users", 0),
+            uptime=status.get("uptime", "N/A"),
+            timestamp=_now_str()
+        )
 
         return await self.send_message(message)
 
@@ -355,22 +712,17 @@ class TelegramNotifier:
         if not self.is_configured():
             return False
 
-        message = f"""📈 <b>Ежедневный отчёт</b>
-
-👥 <b>Всего пользователей:</b> {stats.get("total_users", 0)}
-✅ <b>Активных:</b> {stats.get("active_users", 0)}
-❌ <b>Отключенных:</b> {stats.get("disabled_users", 0)}
-⏰ <b>Истекающих (7 дней):</b> {stats.get("expiring_soon", 0)}
-
-📊 <b>Трафик за сегодня:</b>
-↑ Upload: {self._format_bytes(stats.get("today_upload", 0))}
-↓ Download: {self._format_bytes(stats.get("today_download", 0))}
-
-📊 <b>Трафик всего:</b>
-↑ Upload: {self._format_bytes(stats.get("total_upload", 0))}
-↓ Download: {self._format_bytes(stats.get("total_download", 0))}
-
-<i>{datetime.now().strftime("%Y-%m-%d %H:%M:%S")}</i>"""
+        message = DAILY_REPORT_TEMPLATE.format(
+            total_users=stats.get("total_users", 0),
+            active_users=stats.get("active_users", 0),
+            disabled_users=stats.get("disabled_users", 0),
+            expiring_soon=stats.get("expiring_soon", 0),
+            today_upload=self._format_bytes(stats.get("today_upload", 0)),
+            today_download=self._format_bytes(stats.get("today_download", 0)),
+            total_upload=self._format_bytes(stats.get("total_upload", 0)),
+            total_download=self._format_bytes(stats.get("total_download", 0)),
+            timestamp=_now_str()
+        )
 
         return await self.send_message(message)
 
@@ -379,39 +731,41 @@ class TelegramNotifier:
         if bytes_value == 0:
             return "0 B"
 
-        units = ["B", "KB", "MB", "GB", "TB"]
-        unit_index = 0
-
-        while bytes_value >= 1024 and unit_index < len(units) - 1:
-            bytes_value /= 1024
-            unit_index += 1
+        units = ("B", "KB", "MB", "GB", "TB")
+        # Power of 1024 straight from the bit length: 2**10 -> KB, 2**20 -> MB, ...
+        unit_index = min((abs(int(bytes_value)).bit_length() - 1) // 10, len(units) - 1)
+        unit_index = max(unit_index, 0)
 
-        return f"{bytes_value:.2f} {units[unit_index]}"
+        return f"{bytes_value / (1 << (unit_index * 10)):.2f} {units[unit_index]}"
 
     def clear_alert_history(self, alert_type: str = None):
         """Clear alert history"""
         if alert_type:
-            # Clear specific alert type
-            keys_to_remove = [k for k in self.alert_history.keys() if k.startswith(alert_type)]
-            for key in keys_to_remove:
-                del self.alert_history[key]
+            # Clear specific alert type: the bare type key and all "type:..." keys
+            prefix = alert_type + ":"
+            for key in list(self.alert_history):
+                if key == alert_type or key.startswith(prefix):
+                    del self.alert_history[key]
+            self._stats_by_type.pop(alert_type, None)
+            # Queued alerts of this type would mark themselves sent again
+            self._outbox = [alert for alert in self._outbox if alert[0] != alert_type]
+            self._outbox_keys = {key for key in self._outbox_keys if key != alert_type and not key.startswith(prefix)}
         else:
             # Clear all
             self.alert_history.clear()
+            self._stats_by_type.clear()
+            self._outbox.clear()
+            self._outbox_keys.clear()
 
-        self._save_history()
+        # Full rewrite already includes any pending entries; drop flushes already taken
+        self._history_pending.clear()
+        with self._history_write_lock:
+            self._history_generation += 1
+            self._save_history()
 
     def get_alert_stats(self) -> Dict[str, Any]:
         """Get alert statistics"""
-        stats = {}
-        for key, timestamp in self.alert_history.items():
-            alert_type = key.split(":")[0]
-            if alert_type not in stats:
-                stats[alert_type] = {"count": 0, "last_sent": 0}
-            stats[alert_type]["count"] += 1
-            stats[alert_type]["last_sent"] = max(stats[alert_type]["last_sent"], timestamp)
-
-        return stats
+        return {alert_type: dict(stats) for alert_type, stats in self._stats_by_type.items()}
 
 
 class TelegramBotHandler:
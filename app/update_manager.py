@@ -8,13 +8,18 @@ import aiohttp
 import subprocess
 import os
 import json
+import hashlib
 import logging
+import random
+import time
 import tarfile
 import tempfile
 import shutil
+import stat
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
-from typing import Dict, Optional, List, Callable
-from pathlib import Path
+from typing import Dict, Optional, List, Callable, Tuple
 
 from app.version import (
     CURRENT_VERSION,
@@ -25,6 +30,11 @@ from app.version import (
 )
 from app.config import settings
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
 
@@ -38,6 +48,77 @@ def _get_github_headers() -> Dict:
         headers["Authorization"] = f"Bearer {settings.GITHUB_TOKEN}"
     return headers
 
+def _compact_ts() -> str:
+    """Local time as YYYYmmdd_HHMMSS, the format used in backup file names"""
+    return time.strftime("%Y%m%d_%H%M%S")
+
+# Safe extraction filter (no absolute paths, links out of the tree or device files),
+# in Python 3.12+ and security releases of 3.8-3.11
+_TAR_FILTER: Dict[str, str] = {"filter": "data"} if hasattr(tarfile, "data_filter") else {}
+
+def _extract_tar_stream(read_fd: int, extract_dir: str):
+    """Extract a .tar.gz read sequentially from a pipe (runs in a worker thread)"""
+    with os.fdopen(read_fd, 'rb', buffering=256 * 1024) as stream:
+        with tarfile.open(fileobj=stream, mode='r|gz', bufsize=64 * 1024) as tar:
+            tar.extractall(extract_dir, **_TAR_FILTER)
+
+def _check_extracted_tree(extract_dir: str):
+    """
+    Raise if an extracted archive left anything that tarfile's data filter would refuse
+
+    tar strips absolute and .. member names itself, but not links pointing
+    out of the tree, hardlinks to files elsewhere or device files and FIFOs.
+    """
+    root = os.path.realpath(extract_dir)
+    # Hardlinked files: (device, inode) -> [links found in the tree, link count]
+    hardlinks: Dict[Tuple[int, int], List[int]] = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        for name in dirnames + filenames:
+            path = os.path.join(dirpath, name)
+            st = os.lstat(path)
+            if stat.S_ISLNK(st.st_mode):
+                target = os.path.realpath(path)
+                if target != root and not target.startswith(root + os.sep):
+                    raise Exception(f"Archive link escapes the extraction directory: {os.path.relpath(path, root)}")
+            elif stat.S_ISREG(st.st_mode):
+                if st.st_nlink > 1:
+                    hardlinks.setdefault((st.st_dev, st.st_ino), [0, st.st_nlink])[0] += 1
+            elif not stat.S_ISDIR(st.st_mode):
+                raise Exception(f"Archive contains a special file: {os.path.relpath(path, root)}")
+    # Every link to a hardlinked file must be inside the tree
+    if any(found < nlink for found, nlink in hardlinks.values()):
+        raise Exception("Archive hardlinks a file outside the extraction directory")
+
+async def _wait_tar_process(proc: asyncio.subprocess.Process):
+    """Wait for a tar extraction subprocess, raising if it failed"""
+    _, stderr = await proc.communicate()
+    if proc.returncode != 0:
+        raise Exception(f"tar exited with code {proc.returncode}: {stderr.decode(errors='replace').strip()}")
+
+async def _run_command(cmd: List[str], timeout: float) -> subprocess.CompletedProcess:
+    """
+    Run command without blocking the event loop.
+
+    Mirrors subprocess.run(capture_output=True, text=True, timeout=...):
+    returns CompletedProcess and raises subprocess.TimeoutExpired.
+    """
+    proc = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        raise subprocess.TimeoutExpired(cmd, timeout)
+
+    return subprocess.CompletedProcess(
+        cmd, proc.returncode,
+        stdout.decode(errors="replace"), stderr.decode(errors="replace")
+    )
+
 # Update check configuration
 UPDATE_CHECK_INTERVAL = 24 * 60 * 60  # 24 hours in seconds
 LAST_CHECK_FILE = "/opt/xui-manager/last_update_check.json"
@@ -68,6 +149,186 @@ FILES_TO_SKIP = [
     ".update_status.json"
 ]
 
+# Download read size (matches the extraction pipe buffer) and minimum seconds between progress writes
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+DOWNLOAD_STATUS_INTERVAL = 0.5
+
+# Concurrent GitHub requests, and attempts per request when GitHub asks to back off
+GITHUB_MAX_CONCURRENCY = 10
+GITHUB_MAX_ATTEMPTS = 3
+
+# Backup archive formats, see _create_backup
+BACKUP_SUFFIXES = (".tar.zst", ".tar.gz")
+
+# GitHub's compare API lists at most 300 changed files; larger diffs use the full tarball
+DELTA_MAX_FILES = 300
+
+
+def _file_digest(path: str) -> bytes:
+    """SHA-256 of a file, read in blocks"""
+    with open(path, 'rb') as f:
+        if hasattr(hashlib, "file_digest"):  # Python 3.11+
+            return hashlib.file_digest(f, "sha256").digest()
+        digest = hashlib.sha256()
+        for block in iter(lambda: f.read(64 * 1024), b""):
+            digest.update(block)
+        return digest.digest()
+
+
+def _files_equal(path_a: str, path_b: str) -> bool:
+    """Check if two files have the same content (sizes first, then hashes)"""
+    if os.stat(path_a).st_size != os.stat(path_b).st_size:
+        return False
+    return _file_digest(path_a) == _file_digest(path_b)
+
+
+def _git_blob_sha(content: bytes) -> str:
+    """Git object id of a file's content, as listed by GitHub's compare API"""
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+
+def _copy_file(src_path: str, dest_path: str):
+    """
+    Copy file contents and metadata like shutil.copy2, in the kernel where possible
+
+    copy_file_range copies without user-space buffers and lets reflink-capable
+    filesystems (Btrfs, XFS) share the data instead of duplicating it.
+    """
+    if hasattr(os, "copy_file_range"):  # Linux, Python 3.8+
+        try:
+            with open(src_path, 'rb') as src, open(dest_path, 'wb') as dest:
+                while os.copy_file_range(src.fileno(), dest.fileno(), 1 << 30):
+                    pass
+            shutil.copystat(src_path, dest_path)
+            return
+        except OSError:
+            # Unsupported by the kernel or filesystem (e.g. across filesystems on older kernels)
+            pass
+    shutil.copy2(src_path, dest_path)
+
+
+def _place_file(src_path: str, dest_path: str, current_path: str):
+    """Hardlink src_path to dest_path; across filesystems reuse an identical installed file or copy"""
+    try:
+        os.link(src_path, dest_path)
+        return
+    except OSError:
+        pass
+    # The installed copy is on the destination filesystem, so it can still be linked if unchanged
+    if os.path.isfile(current_path) and _files_equal(src_path, current_path):
+        try:
+            os.link(current_path, dest_path)
+            return
+        except OSError:
+            pass
+    _copy_file(src_path, dest_path)
+
+
+def _link_tree(src_dir: str, dest_dir: str, current_dir: str):
+    """
+    Recreate src_dir at dest_dir with hardlinks (see _place_file), working on files in parallel
+
+    Blocks until every file is placed: call from a worker thread, not the event loop.
+    """
+    jobs = []
+    for root, _, files in os.walk(src_dir):
+        rel_dir = os.path.relpath(root, src_dir)
+        target_dir = os.path.normpath(os.path.join(dest_dir, rel_dir))
+        current_subdir = os.path.normpath(os.path.join(current_dir, rel_dir))
+        os.makedirs(target_dir, exist_ok=True)
+        for name in files:
+            jobs.append((
+                os.path.join(root, name),
+                os.path.join(target_dir, name),
+                os.path.join(current_subdir, name)
+            ))
+
+    # Small files make this syscall-bound, so a few threads overlap the waits
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        for future in [pool.submit(_place_file, *job) for job in jobs]:
+            future.result()
+
+
+def _swap_in_dir(
+    src_dir: str,
+    dest_dir: str,
+    changed_files: Optional[List[str]] = None,
+    removed_files: Optional[List[str]] = None
+):
+    """
+    Replace dest_dir with the contents of src_dir
+
+    The new tree is staged next to dest_dir and swapped in with two renames,
+    so dest_dir is never left half-copied. With changed_files (paths relative
+    to dest_dir, from a delta download) src_dir holds only those files: the
+    staged tree is the installed one with them replaced and removed_files
+    left out. Blocking, like _link_tree; runs via UpdateManager._apply_update.
+    """
+    dest_dir = dest_dir.rstrip('/')
+    new_dir = dest_dir + '.new'
+    old_dir = dest_dir + '.old'
+    # Leftovers from an interrupted update
+    shutil.rmtree(new_dir, ignore_errors=True)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+    if changed_files is None:
+        _link_tree(src_dir, new_dir, dest_dir)
+    else:
+        os.makedirs(new_dir)
+        if os.path.isdir(dest_dir):
+            _link_tree(dest_dir, new_dir, dest_dir)
+        for path in removed_files or []:
+            try:
+                os.remove(os.path.join(new_dir, path))
+            except FileNotFoundError:
+                pass
+        for path in changed_files:
+            staged_path = os.path.join(new_dir, path)
+            os.makedirs(os.path.dirname(staged_path), exist_ok=True)
+            # Staged files are hardlinks to the installed ones: unlink, never write through
+            if os.path.lexists(staged_path):
+                os.remove(staged_path)
+            _copy_file(os.path.join(src_dir, path), staged_path)
+
+    if os.path.exists(dest_dir):
+        os.rename(dest_dir, old_dir)
+    os.rename(new_dir, dest_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def _release_download(release: Dict) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Pick the archive to download for a GitHub release: (url, expected SHA-256)
+
+    GitHub publishes digests only for uploaded assets, not for the generated
+    source tarball, so an uploaded .tar.gz asset with a digest is preferred.
+    """
+    for asset in release.get("assets") or []:
+        digest = asset.get("digest") or ""
+        if asset.get("name", "").endswith(".tar.gz") and digest.startswith("sha256:"):
+            return asset.get("browser_download_url"), digest[len("sha256:"):]
+    return release.get("tarball_url"), None
+
+
+def _replace_file(src_path: str, dest_path: str):
+    """Copy src_path next to dest_path and rename it over, so dest_path is never half-written"""
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    new_path = dest_path + '.new'
+    _copy_file(src_path, new_path)
+    os.replace(new_path, dest_path)
+
+
+def _is_update_path(path: str) -> bool:
+    """Check if a repository path is covered by FILES_TO_UPDATE"""
+    if "__pycache__/" in path or path.endswith(".pyc"):
+        return False
+    if path.startswith("/") or ".." in path.split("/"):
+        return False
+    return any(
+        path.startswith(item) if item.endswith('/') else path == item
+        for item in FILES_TO_UPDATE
+    )
+
 
 class UpdateManager:
     """Manages software updates from GitHub releases"""
@@ -75,13 +336,63 @@ class UpdateManager:
     def __init__(self):
         self.current_version = Version(CURRENT_VERSION)
         self.last_check_data = self._load_last_check()
+        # Jittered per instance so a fleet rebooted together doesn't check in lockstep
+        self.check_interval = UPDATE_CHECK_INTERVAL * random.uniform(0.9, 1.1)
+        self._status_dir_ready = False
+        self._session: Optional[aiohttp.ClientSession] = None  # created on first request
+        self._github_semaphore: Optional[asyncio.Semaphore] = None  # created on the running loop
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Get or create the shared HTTP session (keeps GitHub connections alive)"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=10, limit_per_host=5, ttl_dns_cache=300, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    @asynccontextmanager
+    async def _github_get(self, url: str, timeout: aiohttp.ClientTimeout, headers: Dict = None):
+        """
+        GET a GitHub URL with the GitHub API headers
+
+        At most GITHUB_MAX_CONCURRENCY requests run at once. 429 responses and
+        403s with Retry-After (secondary rate limits) are retried after the
+        requested delay, or with exponential backoff.
+        """
+        if self._github_semaphore is None:
+            self._github_semaphore = asyncio.Semaphore(GITHUB_MAX_CONCURRENCY)
+
+        session = await self._get_session()
+        request_headers = {**_get_github_headers(), **(headers or {})}
+        async with self._github_semaphore:
+            for attempt in range(GITHUB_MAX_ATTEMPTS):
+                response = await session.get(url, headers=request_headers, timeout=timeout)
+                retry_after = response.headers.get("Retry-After")
+                backoff = response.status == 429 or (response.status == 403 and retry_after)
+                if backoff and attempt < GITHUB_MAX_ATTEMPTS - 1:
+                    response.release()
+                    delay = min(float(retry_after), 60.0) if retry_after and retry_after.isdigit() else 2 ** attempt
+                    logger.warning(f"GitHub asked to back off (HTTP {response.status}), retrying in {delay}s")
+                    await asyncio.sleep(delay)
+                    continue
+
+                try:
+                    yield response
+                finally:
+                    response.release()
+                return
+
+    async def close(self):
+        """Close the HTTP session"""
+        if self._session and not self._session.closed:
+            await self._session.close()
 
     def _load_last_check(self) -> Dict:
         """Load last update check data from file"""
         try:
             if os.path.exists(LAST_CHECK_FILE):
-                with open(LAST_CHECK_FILE, 'r') as f:
-                    return json.load(f)
+                with open(LAST_CHECK_FILE, 'rb') as f:
+                    data = f.read()
+                return orjson.loads(data) if orjson is not None else json.loads(data)
         except Exception as e:
             logger.error(f"Error loading last check data: {e}")
         return {
@@ -95,12 +406,16 @@ class UpdateManager:
         try:
             # Ensure directory exists
             os.makedirs(os.path.dirname(LAST_CHECK_FILE), exist_ok=True)
-            with open(LAST_CHECK_FILE, 'w') as f:
-                json.dump(data, f, indent=2)
+            if orjson is not None:
+                payload = orjson.dumps(data, option=orjson.OPT_INDENT_2)
+            else:
+                payload = json.dumps(data, indent=2).encode()
+            with open(LAST_CHECK_FILE, 'wb') as f:
+                f.write(payload)
         except Exception as e:
             logger.error(f"Error saving last check data: {e}", exc_info=True)
 
-    def _update_status(self, status: str, progress: int = 0, message: str = "", details: Dict = None):
+    async def _update_status(self, status: str, progress: int = 0, message: str = "", details: Dict = None):
         """Update and save current update status for progress tracking"""
         try:
             status_data = {
@@ -111,14 +426,21 @@ class UpdateManager:
                 "details": details or {}
             }
 
-            os.makedirs(os.path.dirname(UPDATE_STATUS_FILE), exist_ok=True)
-            with open(UPDATE_STATUS_FILE, 'w') as f:
-                json.dump(status_data, f, indent=2)
+            # Written in a worker thread so the download and other requests aren't stalled
+            await asyncio.get_running_loop().run_in_executor(None, self._write_status, status_data)
 
             logger.info(f"Update status: {status} - {progress}% - {message}")
         except Exception as e:
             logger.error(f"Error saving update status: {e}", exc_info=True)
 
+    def _write_status(self, status_data: Dict):
+        """Write update status file"""
+        if not self._status_dir_ready:
+            os.makedirs(os.path.dirname(UPDATE_STATUS_FILE), exist_ok=True)
+            self._status_dir_ready = True
+        with open(UPDATE_STATUS_FILE, 'w') as f:
+            json.dump(status_data, f, indent=2)
+
     def get_update_status(self) -> Dict:
         """Get current update status"""
         try:
@@ -147,10 +469,16 @@ class UpdateManager:
             Dict with update information
         """
         # Check if we need to update (avoid too frequent checks)
-        if not force and self.last_check_data.get("last_check"):
+        if self.last_check_data.get("last_check"):
             last_check = datetime.fromisoformat(self.last_check_data["last_check"])
-            if datetime.now() - last_check < timedelta(hours=1):
-                logger.info("Using cached update check data")
+            is_fresh = datetime.now() - last_check < timedelta(seconds=self.check_interval)
+            # Even forced checks wait while GitHub's API rate limit is exhausted
+            rate_limited = time.time() < (self.last_check_data.get("rate_limit_reset") or 0)
+            if (is_fresh and not force) or rate_limited:
+                if rate_limited:
+                    logger.info("GitHub API rate limit exhausted, using cached update check data")
+                else:
+                    logger.info("Using cached update check data")
                 # Recalculate update_available based on current version
                 cached_latest = self.last_check_data.get("latest_version", CURRENT_VERSION)
                 try:
@@ -158,6 +486,7 @@ class UpdateManager:
                 except:
                     update_available = False
                 return {
+                    **self.last_check_data.get("result", {}),
                     "current_version": CURRENT_VERSION,
                     "latest_version": cached_latest,
                     "update_available": update_available,
@@ -168,14 +497,35 @@ class UpdateManager:
         try:
             logger.info(f"Checking for updates from {GITHUB_API_URL}")
 
-            timeout = aiohttp.ClientTimeout(total=10)
-            headers = _get_github_headers()
-            async with aiohttp.ClientSession(timeout=timeout, headers=headers) as session:
-                async with session.get(GITHUB_API_URL) as response:
-                    if response.status != 200:
-                        raise Exception(f"GitHub API returned status {response.status}")
+            # Conditional request: GitHub answers 304 without a body if the
+            # release is unchanged, and 304s don't count against the rate limit
+            etag = self.last_check_data.get("etag")
+            cached_result = self.last_check_data.get("result")
+            conditional_headers = {"If-None-Match": etag} if etag and cached_result else {}
 
+            timeout = aiohttp.ClientTimeout(total=10)
+            async with self._github_get(GITHUB_API_URL, timeout, conditional_headers) as response:
+                rate_limit_reset = None
+                if response.headers.get("X-RateLimit-Remaining") == "0":
+                    rate_limit_reset = int(response.headers.get("X-RateLimit-Reset", time.time() + 3600))
+                    logger.warning(f"GitHub API rate limit exhausted until {datetime.fromtimestamp(rate_limit_reset)}")
+                    self.last_check_data["rate_limit_reset"] = rate_limit_reset
+
+                if response.status == 304:
+                    logger.info("Latest release unchanged since last check")
+                    latest_version = Version(cached_result["latest_version"])
+                    result = {
+                        **cached_result,
+                        "current_version": str(self.current_version),
+                        "update_available": latest_version > self.current_version,
+                        "cached": True,
+                        "last_check": datetime.now().isoformat()
+                    }
+                elif response.status != 200:
+                    raise Exception(f"GitHub API returned status {response.status}")
+                else:
                     data = await response.json()
+                    etag = response.headers.get("ETag")
 
                     latest_tag = data.get("tag_name", "").lstrip('v')
                     latest_version = Version(latest_tag)
@@ -183,6 +533,7 @@ class UpdateManager:
                     update_available = latest_version > self.current_version
 
                     changelog = parse_changelog(data.get("body", ""))
+                    download_url, download_sha256 = _release_download(data)
 
                     result = {
                         "current_version": str(self.current_version),
@@ -192,25 +543,29 @@ class UpdateManager:
                         "release_date": data.get("published_at"),
                         "release_url": data.get("html_url"),
                         "changelog": changelog,
-                        "download_url": data.get("tarball_url"),
+                        "download_url": download_url,
+                        "download_sha256": download_sha256,
+                        "tag_name": data.get("tag_name"),
                         "cached": False,
                         "last_check": datetime.now().isoformat()
                     }
 
-                    # Save check data
-                    self._save_last_check({
-                        "last_check": result["last_check"],
-                        "latest_version": str(latest_version),
-                        "update_available": update_available
-                    })
+            self.last_check_data = {
+                "last_check": result["last_check"],
+                "latest_version": result["latest_version"],
+                "update_available": result["update_available"],
+                # Kept to answer the next 304 response
+                "etag": etag,
+                "rate_limit_reset": rate_limit_reset,
+                "result": {k: v for k, v in result.items() if k not in ("cached", "last_check")}
+            }
 
-                    self.last_check_data = {
-                        "last_check": result["last_check"],
-                        "latest_version": str(latest_version),
-                        "update_available": update_available
-                    }
+            # Save check data in a worker thread, not on the event loop
+            await asyncio.get_running_loop().run_in_executor(
+                None, self._save_last_check, dict(self.last_check_data)
+            )
 
-                    return result
+            return result
 
         except asyncio.TimeoutError:
             logger.error("Timeout while checking for updates")
@@ -231,12 +586,21 @@ class UpdateManager:
         """Check if update is currently in progress"""
         return os.path.exists(UPDATE_LOCK_FILE)
 
-    def _create_update_lock(self):
-        """Create lock file to prevent concurrent updates"""
+    def _create_update_lock(self) -> bool:
+        """
+        Create lock file to prevent concurrent updates
+
+        Returns:
+            False if the lock is already held
+        """
         try:
             # Ensure directory exists
             os.makedirs(os.path.dirname(UPDATE_LOCK_FILE), exist_ok=True)
-            Path(UPDATE_LOCK_FILE).touch()
+            # O_EXCL makes check-and-create atomic, so two updates can't both take the lock
+            os.close(os.open(UPDATE_LOCK_FILE, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644))
+            return True
+        except FileExistsError:
+            return False
         except Exception as e:
             logger.error(f"Error creating lock file: {e}", exc_info=True)
             raise
@@ -263,21 +627,19 @@ class UpdateManager:
         Returns:
             Dict with update result
         """
-        if self.is_update_in_progress():
-            return {
-                "success": False,
-                "error": "Update already in progress"
-            }
-
         try:
-            self._create_update_lock()
-            self._update_status("checking", 5, "Проверка обновлений...")
+            if not self._create_update_lock():
+                return {
+                    "success": False,
+                    "error": "Update already in progress"
+                }
+            await self._update_status("checking", 5, "Проверка обновлений...")
 
             # Check if update is available
             update_info = await self.check_for_updates(force=True)
             if not update_info.get("update_available"):
                 self._remove_update_lock()
-                self._update_status("failed", 0, "Обновления не найдены")
+                await self._update_status("failed", 0, "Обновления не найдены")
                 return {
                     "success": False,
                     "error": "No update available",
@@ -285,59 +647,71 @@ class UpdateManager:
                 }
 
             logger.info(f"Starting update from {CURRENT_VERSION} to {update_info['latest_version']}")
-            self._update_status("backup", 10, "Создание резервной копии...")
+            await self._update_status("backup", 10, "Создание резервной копии...")
 
             # Create backup before update
-            backup_result = self._create_backup()
+            backup_result = await self._create_backup()
             if not backup_result["success"]:
                 self._remove_update_lock()
-                self._update_status("failed", 0, f"Ошибка бэкапа: {backup_result['error']}")
+                await self._update_status("failed", 0, f"Ошибка бэкапа: {backup_result['error']}")
                 return {
                     "success": False,
                     "error": f"Backup failed: {backup_result['error']}"
                 }
 
-            self._update_status("downloading", 20, "Скачивание обновления с GitHub...")
+            await self._update_status("downloading", 20, "Скачивание обновления с GitHub...")
 
-            # Download update from GitHub
-            download_result = await self._download_update(update_info["download_url"])
+            # Download only changed files if possible, otherwise the full release.
+            # A published digest covers only the release archive, so it rules out the delta.
+            download_sha256 = update_info.get("download_sha256")
+            download_result = {"success": False}
+            if not download_sha256:
+                download_result = await self._download_delta(
+                    f"v{CURRENT_VERSION}", update_info.get("tag_name") or f"v{update_info['latest_version']}"
+                )
+            if not download_result["success"]:
+                download_result = await self._download_update(update_info["download_url"], download_sha256)
             if not download_result["success"]:
                 self._remove_update_lock()
-                self._update_status("failed", 0, f"Ошибка загрузки: {download_result['error']}")
+                await self._update_status("failed", 0, f"Ошибка загрузки: {download_result['error']}")
                 return {
                     "success": False,
                     "error": f"Download failed: {download_result['error']}",
                     "backup_file": backup_result.get("backup_file")
                 }
 
-            self._update_status("extracting", 50, "Распаковка файлов...")
+            await self._update_status("extracting", 50, "Распаковка файлов...")
 
             # Extract and install files
-            install_result = await self._install_update(download_result["temp_dir"])
+            install_result = await self._install_update(
+                download_result["temp_dir"],
+                download_result.get("changed_files"),
+                download_result.get("removed_files")
+            )
             if not install_result["success"]:
                 self._remove_update_lock()
-                self._update_status("failed", 0, f"Ошибка установки: {install_result['error']}")
+                await self._update_status("failed", 0, f"Ошибка установки: {install_result['error']}")
                 return {
                     "success": False,
                     "error": f"Installation failed: {install_result['error']}",
                     "backup_file": backup_result.get("backup_file")
                 }
 
-            self._update_status("dependencies", 80, "Установка зависимостей...")
+            await self._update_status("dependencies", 80, "Установка зависимостей...")
 
             # Install dependencies if requirements changed
             if install_result.get("requirements_changed"):
-                deps_result = self._install_dependencies()
+                deps_result = await self._install_dependencies()
                 if not deps_result["success"]:
                     logger.warning(f"Dependencies installation warning: {deps_result.get('error')}")
 
-            self._update_status("restarting", 90, "Перезапуск сервиса...")
+            await self._update_status("restarting", 90, "Перезапуск сервиса...")
 
             # Restart service
-            restart_result = self._restart_service()
+            restart_result = await self._restart_service()
 
             self._remove_update_lock()
-            self._update_status("completed", 100, "Обновление завершено!")
+            await self._update_status("completed", 100, "Обновление завершено!")
 
             return {
                 "success": True,
@@ -353,29 +727,36 @@ class UpdateManager:
         except Exception as e:
             logger.error(f"Error during update: {e}", exc_info=True)
             self._remove_update_lock()
-            self._update_status("failed", 0, f"Ошибка: {str(e)}")
+            await self._update_status("failed", 0, f"Ошибка: {str(e)}")
             return {
                 "success": False,
                 "error": str(e)
             }
 
-    def _create_backup(self) -> Dict:
+    async def _create_backup(self) -> Dict:
         """Create backup of current installation
 
         Excludes temporary files, logs, and backups directory to avoid conflicts
         tar exit code 1 (file changed as we read it) is considered success
         """
         try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_file = f"/opt/xui-manager/backups/backup_{timestamp}.tar.gz"
+            timestamp = _compact_ts()
+
+            # Compression dominates the backup time: zstd (all cores) matches gzip's
+            # ratio several times faster; otherwise fast gzip, on all cores with pigz
+            if shutil.which("zstd"):
+                compressor, suffix = "zstd -T0 -3", ".tar.zst"
+            else:
+                compressor, suffix = ("pigz -1" if shutil.which("pigz") else "gzip -1"), ".tar.gz"
+            backup_file = f"/opt/xui-manager/backups/backup_{timestamp}{suffix}"
 
             os.makedirs("/opt/xui-manager/backups", exist_ok=True)
 
             # Create tar archive of important files
             # Exclude changing files to prevent "file changed as we read it" errors
-            result = subprocess.run(
+            result = await _run_command(
                 [
-                    "tar", "-czf", backup_file,
+                    "tar", "-I", compressor, "-cf", backup_file,
                     "-C", "/opt/xui-manager",
                     "--exclude=venv",
                     "--exclude=.git",
@@ -392,8 +773,6 @@ class UpdateManager:
                     "--exclude=*.db-shm",
                     "."
                 ],
-                capture_output=True,
-                text=True,
                 timeout=60
             )
 
@@ -423,43 +802,175 @@ class UpdateManager:
                 "error": str(e)
             }
 
-    async def _download_update(self, tarball_url: str) -> Dict:
-        """Download release tarball from GitHub"""
+    async def _download_delta(self, old_ref: str, new_ref: str) -> Dict:
+        """
+        Download only files changed between two release tags
+
+        Uses the GitHub compare API to list changed files under FILES_TO_UPDATE
+        and fetches them from raw.githubusercontent.com, checking each against
+        the git blob SHA the compare API lists for it. Fails (so the caller
+        falls back to the full tarball) if either tag is unknown, the diff is
+        too large to be listed completely or a file doesn't match.
+        """
+        temp_dir = None
+        try:
+            compare_url = f"https://api.github.com/repos/{GITHUB_REPO}/compare/{old_ref}...{new_ref}"
+
+            timeout = aiohttp.ClientTimeout(total=300)  # 5 minutes
+            async with self._github_get(compare_url, timeout) as response:
+                if response.status != 200:
+                    raise Exception(f"Compare API returned HTTP {response.status}")
+                data = await response.json()
+
+            files = data.get("files", [])
+            if len(files) >= DELTA_MAX_FILES:
+                raise Exception(f"Too many changed files ({len(files)})")
+
+            changed_files = []
+            removed_files = []
+            blob_shas = {}
+            for entry in files:
+                path = entry["filename"]
+                previous = entry.get("previous_filename")
+                if previous and _is_update_path(previous):
+                    removed_files.append(previous)
+                if not _is_update_path(path):
+                    continue
+                if entry.get("status") == "removed":
+                    removed_files.append(path)
+                else:
+                    if not entry.get("sha"):
+                        raise Exception(f"No blob SHA listed for {path}")
+                    changed_files.append(path)
+                    blob_shas[path] = entry["sha"]
+
+            # Same layout as an extracted tarball, so _install_update cleans it up
+            temp_dir = tempfile.mkdtemp(prefix="xui-update-")
+            source_dir = os.path.join(temp_dir, "extracted", "delta")
+
+            async def fetch(path: str):
+                url = f"https://raw.githubusercontent.com/{GITHUB_REPO}/{new_ref}/{path}"
+                async with self._github_get(url, timeout) as file_response:
+                    if file_response.status != 200:
+                        raise Exception(f"HTTP {file_response.status} for {path}")
+                    content = await file_response.read()
+                # Raw files come without a digest; check them against the compare listing
+                if _git_blob_sha(content) != blob_shas[path]:
+                    raise Exception(f"Blob SHA mismatch for {path}")
+                dest_path = os.path.join(source_dir, path)
+                os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+                with open(dest_path, 'wb') as f:
+                    f.write(content)
+
+            await asyncio.gather(*(fetch(path) for path in changed_files))
+
+            logger.info(f"Downloaded delta {old_ref}...{new_ref}: {len(changed_files)} files")
+            return {
+                "success": True,
+                "temp_dir": source_dir,
+                "changed_files": changed_files,
+                "removed_files": removed_files
+            }
+
+        except Exception as e:
+            logger.info(f"Delta update unavailable, using full download: {e}")
+            if temp_dir:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+            return {
+                "success": False,
+                "error": str(e)
+            }
+
+    async def _download_update(self, tarball_url: str, expected_sha256: Optional[str] = None) -> Dict:
+        """
+        Download release tarball from GitHub
+
+        The archive is never written to disk: downloaded chunks go through a
+        pipe into tar (or tarfile in a worker thread if tar is not installed)
+        that extracts them as they arrive. The bytes are hashed on the way;
+        with expected_sha256 a mismatch fails the download before anything
+        is installed. The extracted tree is used only once the digest matches
+        and _check_extracted_tree finds nothing escaping it.
+        """
+        temp_dir = None
         try:
             temp_dir = tempfile.mkdtemp(prefix="xui-update-")
-            tarball_path = os.path.join(temp_dir, "release.tar.gz")
+            extract_dir = os.path.join(temp_dir, "extracted")
+            os.makedirs(extract_dir, exist_ok=True)
 
             logger.info(f"Downloading from {tarball_url}")
 
-            timeout = aiohttp.ClientTimeout(total=300)  # 5 minutes
-            headers = _get_github_headers()
-            async with aiohttp.ClientSession(timeout=timeout, headers=headers) as session:
-                async with session.get(tarball_url) as response:
-                    if response.status != 200:
-                        raise Exception(f"HTTP {response.status}")
-
-                    # Download with progress tracking
-                    total_size = int(response.headers.get('content-length', 0))
-                    downloaded = 0
-
-                    with open(tarball_path, 'wb') as f:
-                        async for chunk in response.content.iter_chunked(8192):
-                            f.write(chunk)
+            loop = asyncio.get_running_loop()
+            read_fd, write_fd = os.pipe()
+            if shutil.which("tar"):
+                # Native tar is several times faster than tarfile and runs off the Python threads
+                try:
+                    proc = await asyncio.create_subprocess_exec(
+                        # Extracted as root: keep tar from restoring owners and setuid/sticky bits
+                        "tar", "--no-same-owner", "--no-same-permissions", "-xzf", "-", "-C", extract_dir,
+                        stdin=read_fd,
+                        stderr=asyncio.subprocess.PIPE
+                    )
+                except BaseException:
+                    # The write end is only handed over to os.fdopen below
+                    os.close(write_fd)
+                    raise
+                finally:
+                    os.close(read_fd)
+                extraction = loop.create_task(_wait_tar_process(proc))
+            else:
+                extraction = loop.run_in_executor(None, _extract_tar_stream, read_fd, extract_dir)
+
+            try:
+                with os.fdopen(write_fd, 'wb') as pipe:
+                    timeout = aiohttp.ClientTimeout(total=300)  # 5 minutes
+                    async with self._github_get(tarball_url, timeout) as response:
+                        if response.status != 200:
+                            raise Exception(f"HTTP {response.status}")
+
+                        # Download with progress tracking
+                        total_size = int(response.headers.get('content-length', 0))
+                        downloaded = 0
+                        # Status is a file write: report at most every 1% or DOWNLOAD_STATUS_INTERVAL
+                        last_progress = 20
+                        last_status_time = time.monotonic()
+                        digest = hashlib.sha256()
+                        extracting = True
+
+                        async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                            digest.update(chunk)
+                            if extracting:
+                                try:
+                                    await loop.run_in_executor(None, pipe.write, chunk)
+                                except BrokenPipeError:
+                                    # Extraction stopped reading; finish the download only to verify it
+                                    if not expected_sha256:
+                                        break
+                                    extracting = False
                             downloaded += len(chunk)
 
                             if total_size > 0:
                                 progress = 20 + int(30 * downloaded / total_size)  # 20-50%
-                                self._update_status("downloading", progress,
-                                                  f"Скачано {downloaded // 1024} KB из {total_size // 1024} KB")
-
-            logger.info(f"Downloaded to {tarball_path}")
+                                now = time.monotonic()
+                                if progress > last_progress or now - last_status_time >= DOWNLOAD_STATUS_INTERVAL:
+                                    last_progress = progress
+                                    last_status_time = now
+                                    await self._update_status("downloading", progress,
+                                                            f"Скачано {downloaded // 1024} KB из {total_size // 1024} KB")
+            except BrokenPipeError:
+                # Extraction stopped reading; its error is raised below
+                pass
+            except BaseException:
+                # The closed pipe ends the extraction early, wait for it before bailing out
+                await asyncio.gather(extraction, return_exceptions=True)
+                raise
 
-            # Extract tarball
-            extract_dir = os.path.join(temp_dir, "extracted")
-            os.makedirs(extract_dir, exist_ok=True)
+            await extraction
+            logger.info(f"Downloaded and extracted to {extract_dir} (sha256 {digest.hexdigest()})")
 
-            with tarfile.open(tarball_path, 'r:gz') as tar:
-                tar.extractall(extract_dir)
+            if expected_sha256 and digest.hexdigest() != expected_sha256.lower():
+                raise Exception(f"SHA-256 mismatch: expected {expected_sha256}, got {digest.hexdigest()}")
+            await loop.run_in_executor(None, _check_extracted_tree, extract_dir)
 
             # GitHub tarballs have a root directory, find it
             extracted_items = os.listdir(extract_dir)
@@ -470,35 +981,89 @@ class UpdateManager:
 
             return {
                 "success": True,
-                "temp_dir": source_dir,
-                "tarball_path": tarball_path
+                "temp_dir": source_dir
             }
 
         except asyncio.TimeoutError:
+            if temp_dir:
+                shutil.rmtree(temp_dir, ignore_errors=True)
             return {
                 "success": False,
                 "error": "Download timeout"
             }
         except Exception as e:
             logger.error(f"Download error: {e}", exc_info=True)
+            if temp_dir:
+                shutil.rmtree(temp_dir, ignore_errors=True)
             return {
                 "success": False,
                 "error": str(e)
             }
 
-    async def _install_update(self, source_dir: str) -> Dict:
-        """Install update by copying only code files"""
+    async def _install_update(
+        self,
+        source_dir: str,
+        changed_files: Optional[List[str]] = None,
+        removed_files: Optional[List[str]] = None
+    ) -> Dict:
+        """
+        Install update by copying only code files
+
+        With changed_files (a delta download), only those files are replaced
+        and removed_files are deleted; otherwise FILES_TO_UPDATE are replaced.
+        Either way directories are staged and swapped in whole (_swap_in_dir)
+        and single files are renamed over, so nothing is left half-updated.
+        The file work runs in a worker thread, off the event loop.
+        """
         try:
-            install_dir = "/opt/xui-manager"
-            files_updated = []
-            requirements_changed = False
+            return await asyncio.get_running_loop().run_in_executor(
+                None, self._apply_update, source_dir, changed_files, removed_files
+            )
+        except Exception as e:
+            logger.error(f"Installation error: {e}", exc_info=True)
+            return {
+                "success": False,
+                "error": str(e)
+            }
 
+    def _apply_update(
+        self,
+        source_dir: str,
+        changed_files: Optional[List[str]],
+        removed_files: Optional[List[str]]
+    ) -> Dict:
+        """Replace installed files for _install_update (blocking, runs in a worker thread)"""
+        install_dir = "/opt/xui-manager"
+        files_updated = []
+        requirements_changed = False
+
+        if changed_files is not None:
+            removed_files = removed_files or []
+            for item in FILES_TO_UPDATE:
+                dest_path = os.path.join(install_dir, item)
+                if item.endswith('/'):
+                    changed = [path[len(item):] for path in changed_files if path.startswith(item)]
+                    removed = [path[len(item):] for path in removed_files if path.startswith(item)]
+                    if changed or removed:
+                        _swap_in_dir(os.path.join(source_dir, item), dest_path, changed, removed)
+                        files_updated.extend(item + path for path in changed + removed)
+                elif item in changed_files:
+                    _replace_file(os.path.join(source_dir, item), dest_path)
+                    files_updated.append(item)
+                elif item in removed_files:
+                    try:
+                        os.remove(dest_path)
+                        files_updated.append(item)
+                    except FileNotFoundError:
+                        pass
+            requirements_changed = "requirements.txt" in changed_files
+            logger.info(f"Delta update: {len(changed_files)} changed, {len(removed_files)} removed")
+        else:
             # Check if requirements.txt will change
             old_req = os.path.join(install_dir, "requirements.txt")
             new_req = os.path.join(source_dir, "requirements.txt")
             if os.path.exists(old_req) and os.path.exists(new_req):
-                with open(old_req, 'r') as f1, open(new_req, 'r') as f2:
-                    requirements_changed = (f1.read() != f2.read())
+                requirements_changed = not _files_equal(old_req, new_req)
 
             # Update only code files
             for item in FILES_TO_UPDATE:
@@ -509,40 +1074,30 @@ class UpdateManager:
                     logger.warning(f"Source path not found: {source_path}")
                     continue
 
-                # If it's a directory, copy recursively
+                # If it's a directory, swap in a hardlinked copy
                 if item.endswith('/'):
-                    if os.path.exists(dest_path):
-                        shutil.rmtree(dest_path)
-                    shutil.copytree(source_path, dest_path)
+                    _swap_in_dir(source_path, dest_path)
                     files_updated.append(item)
                     logger.info(f"Updated directory: {item}")
                 else:
                     # Copy file
-                    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
-                    shutil.copy2(source_path, dest_path)
+                    _replace_file(source_path, dest_path)
                     files_updated.append(item)
                     logger.info(f"Updated file: {item}")
 
-            # Clean up temp directory
-            try:
-                shutil.rmtree(os.path.dirname(os.path.dirname(source_dir)))
-            except:
-                pass
-
-            return {
-                "success": True,
-                "files_updated": files_updated,
-                "requirements_changed": requirements_changed
-            }
+        # Clean up temp directory
+        try:
+            shutil.rmtree(os.path.dirname(os.path.dirname(source_dir)))
+        except:
+            pass
 
-        except Exception as e:
-            logger.error(f"Installation error: {e}", exc_info=True)
-            return {
-                "success": False,
-                "error": str(e)
-            }
+        return {
+            "success": True,
+            "files_updated": files_updated,
+            "requirements_changed": requirements_changed
+        }
 
-    def _install_dependencies(self) -> Dict:
+    async def _install_dependencies(self) -> Dict:
         """Install Python dependencies from requirements.txt"""
         try:
             venv_python = "/opt/xui-manager/venv/bin/python"
@@ -554,10 +1109,9 @@ class UpdateManager:
 
             logger.info("Installing dependencies...")
 
-            result = subprocess.run(
-                [venv_python, "-m", "pip", "install", "-r", requirements_file, "--no-cache-dir"],
-                capture_output=True,
-                text=True,
+            result = await _run_command(
+                # Wheels over source builds, and pip's cache kept so repeat installs skip downloads
+                [venv_python, "-m", "pip", "install", "-r", requirements_file, "--prefer-binary"],
                 timeout=180  # 3 minutes
             )
 
@@ -584,14 +1138,12 @@ class UpdateManager:
                 "error": str(e)
             }
 
-    def _restart_service(self) -> Dict:
+    async def _restart_service(self) -> Dict:
         """Restart xui-manager service using sudo"""
         try:
             # Try with sudo first (requires sudoers configuration)
-            result = subprocess.run(
+            result = await _run_command(
                 ["sudo", "systemctl", "restart", "xui-manager"],
-                capture_output=True,
-                text=True,
                 timeout=10
             )
 
@@ -604,10 +1156,8 @@ class UpdateManager:
 
             # If sudo failed, try without sudo (for development)
             logger.warning("Sudo restart failed, trying without sudo")
-            result = subprocess.run(
+            result = await _run_command(
                 ["systemctl", "restart", "xui-manager"],
-                capture_output=True,
-                text=True,
                 timeout=10
             )
 
@@ -643,15 +1193,13 @@ class UpdateManager:
         Returns:
             Dict with update result
         """
-        if self.is_update_in_progress():
-            return {
-                "success": False,
-                "error": "Update already in progress"
-            }
-
         try:
-            self._create_update_lock()
-            self._update_status("checking", 5, "Получение информации о версии...")
+            if not self._create_update_lock():
+                return {
+                    "success": False,
+                    "error": "Update already in progress"
+                }
+            await self._update_status("checking", 5, "Получение информации о версии...")
 
             # Get release info
             if version:
@@ -661,7 +1209,7 @@ class UpdateManager:
 
             if "error" in release_info:
                 self._remove_update_lock()
-                self._update_status("failed", 0, f"Ошибка: {release_info['error']}")
+                await self._update_status("failed", 0, f"Ошибка: {release_info['error']}")
                 return {
                     "success": False,
                     "error": release_info["error"]
@@ -677,7 +1225,7 @@ class UpdateManager:
             # Check if update needed
             if not force and target_version == CURRENT_VERSION:
                 self._remove_update_lock()
-                self._update_status("idle", 0, "Уже установлена актуальная версия")
+                await self._update_status("idle", 0, "Уже установлена актуальная версия")
                 return {
                     "success": False,
                     "error": f"Already on version {CURRENT_VERSION}",
@@ -689,11 +1237,11 @@ class UpdateManager:
             # Backup
             backup_file = None
             if backup:
-                self._update_status("backup", 10, "Создание резервной копии...")
-                backup_result = self._create_backup()
+                await self._update_status("backup", 10, "Создание резервной копии...")
+                backup_result = await self._create_backup()
                 if not backup_result["success"]:
                     self._remove_update_lock()
-                    self._update_status("failed", 0, f"Ошибка бэкапа: {backup_result['error']}")
+                    await self._update_status("failed", 0, f"Ошибка бэкапа: {backup_result['error']}")
                     return {
                         "success": False,
                         "error": f"Backup failed: {backup_result['error']}"
@@ -701,11 +1249,18 @@ class UpdateManager:
                 backup_file = backup_result.get("backup_file")
 
             # Download
-            self._update_status("downloading", 20, "Скачивание обновления...")
-            download_result = await self._download_update(download_url)
+            await self._update_status("downloading", 20, "Скачивание обновления...")
+            download_sha256 = release_info.get("download_sha256")
+            download_result = {"success": False}
+            # A forced reinstall of the same version needs the full release, and a
+            # published digest covers only the release archive
+            if target_version != CURRENT_VERSION and not download_sha256:
+                download_result = await self._download_delta(f"v{CURRENT_VERSION}", f"v{target_version}")
+            if not download_result["success"]:
+                download_result = await self._download_update(download_url, download_sha256)
             if not download_result["success"]:
                 self._remove_update_lock()
-                self._update_status("failed", 0, f"Ошибка загрузки: {download_result['error']}")
+                await self._update_status("failed", 0, f"Ошибка загрузки: {download_result['error']}")
                 return {
                     "success": False,
                     "error": f"Download failed: {download_result['error']}",
@@ -713,11 +1268,15 @@ class UpdateManager:
                 }
 
             # Install
-            self._update_status("extracting", 50, "Установка файлов...")
-            install_result = await self._install_update(download_result["temp_dir"])
+            await self._update_status("extracting", 50, "Установка файлов...")
+            install_result = await self._install_update(
+                download_result["temp_dir"],
+                download_result.get("changed_files"),
+                download_result.get("removed_files")
+            )
             if not install_result["success"]:
                 self._remove_update_lock()
-                self._update_status("failed", 0, f"Ошибка установки: {install_result['error']}")
+                await self._update_status("failed", 0, f"Ошибка установки: {install_result['error']}")
                 return {
                     "success": False,
                     "error": f"Installation failed: {install_result['error']}",
@@ -725,18 +1284,18 @@ class UpdateManager:
                 }
 
             # Dependencies
-            self._update_status("dependencies", 80, "Установка зависимостей...")
+            await self._update_status("dependencies", 80, "Установка зависимостей...")
             if install_result.get("requirements_changed"):
-                deps_result = self._install_dependencies()
+                deps_result = await self._install_dependencies()
                 if not deps_result["success"]:
                     logger.warning(f"Dependencies warning: {deps_result.get('error')}")
 
             # Restart
-            self._update_status("restarting", 90, "Перезапуск сервиса...")
-            restart_result = self._restart_service()
+            await self._update_status("restarting", 90, "Перезапуск сервиса...")
+            restart_result = await self._restart_service()
 
             self._remove_update_lock()
-            self._update_status("completed", 100, "Обновление завершено!")
+            await self._update_status("completed", 100, "Обновление завершено!")
 
             return {
                 "success": True,
@@ -751,7 +1310,7 @@ class UpdateManager:
         except Exception as e:
             logger.error(f"Error during update: {e}", exc_info=True)
             self._remove_update_lock()
-            self._update_status("failed", 0, f"Ошибка: {str(e)}")
+            await self._update_status("failed", 0, f"Ошибка: {str(e)}")
             return {
                 "success": False,
                 "error": str(e)
@@ -763,23 +1322,23 @@ class UpdateManager:
             url = f"https://api.github.com/repos/{GITHUB_REPO}/releases/tags/v{version}"
 
             timeout = aiohttp.ClientTimeout(total=10)
-            headers = _get_github_headers()
-            async with aiohttp.ClientSession(timeout=timeout, headers=headers) as session:
-                async with session.get(url) as response:
-                    if response.status == 404:
-                        return {"error": f"Version {version} not found"}
-                    if response.status != 200:
-                        return {"error": f"GitHub API returned {response.status}"}
+            async with self._github_get(url, timeout) as response:
+                if response.status == 404:
+                    return {"error": f"Version {version} not found"}
+                if response.status != 200:
+                    return {"error": f"GitHub API returned {response.status}"}
 
-                    data = await response.json()
+                data = await response.json()
+                download_url, download_sha256 = _release_download(data)
 
-                    return {
-                        "version": version,
-                        "download_url": data.get("tarball_url"),
-                        "release_name": data.get("name"),
-                        "release_date": data.get("published_at"),
-                        "changelog": parse_changelog(data.get("body", ""))
-                    }
+                return {
+                    "version": version,
+                    "download_url": download_url,
+                    "download_sha256": download_sha256,
+                    "release_name": data.get("name"),
+                    "release_date": data.get("published_at"),
+                    "changelog": parse_changelog(data.get("body", ""))
+                }
 
         except Exception as e:
             logger.error(f"Error getting release {version}: {e}")
@@ -791,33 +1350,31 @@ class UpdateManager:
             url = f"https://api.github.com/repos/{GITHUB_REPO}/releases?per_page={limit}"
 
             timeout = aiohttp.ClientTimeout(total=10)
-            headers = _get_github_headers()
-            async with aiohttp.ClientSession(timeout=timeout, headers=headers) as session:
-                async with session.get(url) as response:
-                    if response.status != 200:
-                        return {"error": f"GitHub API returned {response.status}"}
-
-                    data = await response.json()
-
-                    releases = []
-                    for release in data:
-                        releases.append({
-                            "version": release.get("tag_name", "").lstrip('v'),
-                            "tag_name": release.get("tag_name"),
-                            "name": release.get("name"),
-                            "published_at": release.get("published_at"),
-                            "download_url": release.get("tarball_url"),
-                            "html_url": release.get("html_url"),
-                            "prerelease": release.get("prerelease", False)
-                        })
+            async with self._github_get(url, timeout) as response:
+                if response.status != 200:
+                    return {"error": f"GitHub API returned {response.status}"}
+
+                data = await response.json()
+
+                releases = []
+                for release in data:
+                    releases.append({
+                        "version": release.get("tag_name", "").lstrip('v'),
+                        "tag_name": release.get("tag_name"),
+                        "name": release.get("name"),
+                        "published_at": release.get("published_at"),
+                        "download_url": release.get("tarball_url"),
+                        "html_url": release.get("html_url"),
+                        "prerelease": release.get("prerelease", False)
+                    })
 
-                    latest = releases[0]["version"] if releases else None
+                latest = releases[0]["version"] if releases else None
 
-                    return {
-                        "releases": releases,
-                        "latest": latest,
-                        "current_version": CURRENT_VERSION
-                    }
+                return {
+                    "releases": releases,
+                    "latest": latest,
+                    "current_version": CURRENT_VERSION
+                }
 
         except Exception as e:
             logger.error(f"Error getting releases: {e}")
@@ -833,22 +1390,23 @@ class UpdateManager:
                 return []
 
             for filename in sorted(os.listdir(backup_dir), reverse=True):
-                if filename.endswith('.tar.gz'):
+                suffix = next((s for s in BACKUP_SUFFIXES if filename.endswith(s)), None)
+                if suffix:
                     filepath = os.path.join(backup_dir, filename)
-                    stat = os.stat(filepath)
+                    file_stat = os.stat(filepath)
 
                     # Parse timestamp from filename
                     try:
-                        timestamp_str = filename.replace('backup_', '').replace('.tar.gz', '')
+                        timestamp_str = filename.replace('backup_', '').replace(suffix, '')
                         created = datetime.strptime(timestamp_str, "%Y%m%d_%H%M%S")
                     except:
-                        created = datetime.fromtimestamp(stat.st_mtime)
+                        created = datetime.fromtimestamp(file_stat.st_mtime)
 
                     backups.append({
                         "filename": filename,
                         "path": filepath,
-                        "size_bytes": stat.st_size,
-                        "size_mb": round(stat.st_size / (1024 * 1024), 2),
+                        "size_bytes": file_stat.st_size,
+                        "size_mb": round(file_stat.st_size / (1024 * 1024), 2),
                         "created": created.isoformat()
                     })
 
@@ -858,7 +1416,7 @@ class UpdateManager:
             logger.error(f"Error listing backups: {e}")
             return []
 
-    def rollback(self, backup_path: str) -> Dict:
+    async def rollback(self, backup_path: str) -> Dict:
         """Rollback to a previous backup
 
         Args:
@@ -870,21 +1428,26 @@ class UpdateManager:
         if not os.path.exists(backup_path):
             return {"success": False, "error": "Backup file not found"}
 
-        if self.is_update_in_progress():
-            return {"success": False, "error": "Update in progress, cannot rollback"}
-
         try:
-            self._create_update_lock()
-            self._update_status("rollback", 10, "Восстановление из резервной копии...")
+            if not self._create_update_lock():
+                return {"success": False, "error": "Update in progress, cannot rollback"}
+            await self._update_status("rollback", 10, "Восстановление из резервной копии...")
 
             install_dir = "/opt/xui-manager"
 
             # Extract backup to temp directory first
             temp_dir = tempfile.mkdtemp(prefix="xui-rollback-")
-            with tarfile.open(backup_path, 'r:gz') as tar:
-                tar.extractall(temp_dir)
+            if backup_path.endswith(".tar.zst"):
+                # tarfile can't read zstd
+                result = await _run_command(["tar", "-I", "zstd", "-xf", backup_path, "-C", temp_dir], timeout=120)
+                if result.returncode != 0:
+                    raise Exception(f"tar exited with code {result.returncode}: {result.stderr.strip()}")
+            else:
+                # Streaming mode: one sequential pass, no seeks
+                with tarfile.open(backup_path, 'r|gz', bufsize=64 * 1024) as tar:
+                    tar.extractall(temp_dir, **_TAR_FILTER)
 
-            self._update_status("rollback", 50, "Копирование файлов...")
+            await self._update_status("rollback", 50, "Копирование файлов...")
 
             # Copy files from backup
             for item in FILES_TO_UPDATE:
@@ -906,18 +1469,18 @@ class UpdateManager:
             # Clean up
             shutil.rmtree(temp_dir)
 
-            self._update_status("rollback", 80, "Установка зависимостей...")
+            await self._update_status("rollback", 80, "Установка зависимостей...")
 
             # Reinstall dependencies
-            self._install_dependencies()
+            await self._install_dependencies()
 
-            self._update_status("rollback", 90, "Перезапуск сервиса...")
+            await self._update_status("rollback", 90, "Перезапуск сервиса...")
 
             # Restart service
-            restart_result = self._restart_service()
+            restart_result = await self._restart_service()
 
             self._remove_update_lock()
-            self._update_status("completed", 100, "Откат завершён!")
+            await self._update_status("completed", 100, "Откат завершён!")
 
             # Try to determine restored version
             restored_version = "unknown"
@@ -941,7 +1504,7 @@ class UpdateManager:
         except Exception as e:
             logger.error(f"Rollback error: {e}", exc_info=True)
             self._remove_update_lock()
-            self._update_status("failed", 0, f"Ошибка отката: {str(e)}")
+            await self._update_status("failed", 0, f"Ошибка отката: {str(e)}")
             return {
                 "success": False,
                 "error": str(e)
@@ -1218,25 +1781,25 @@ class UpdateManager:
             }
 
             timeout = aiohttp.ClientTimeout(total=30)
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                async with session.post(url, json=payload, headers=headers) as response:
-                    if response.status == 201:
-                        data = await response.json()
-                        logger.info(f"Created GitHub release: {tag_name}")
-                        return {
-                            "success": True,
-                            "tag_name": tag_name,
-                            "release_name": data.get("name"),
-                            "html_url": data.get("html_url"),
-                            "id": data.get("id"),
-                            "created_at": data.get("created_at")
-                        }
-                    else:
-                        error_text = await response.text()
-                        return {
-                            "success": False,
-                            "error": f"GitHub API error {response.status}: {error_text}"
-                        }
+            session = await self._get_session()
+            async with session.post(url, json=payload, headers=headers, timeout=timeout) as response:
+                if response.status == 201:
+                    data = await response.json()
+                    logger.info(f"Created GitHub release: {tag_name}")
+                    return {
+                        "success": True,
+                        "tag_name": tag_name,
+                        "release_name": data.get("name"),
+                        "html_url": data.get("html_url"),
+                        "id": data.get("id"),
+                        "created_at": data.get("created_at")
+                    }
+                else:
+                    error_text = await response.text()
+                    return {
+                        "success": False,
+                        "error": f"GitHub API error {response.status}: {error_text}"
+                    }
 
         except Exception as e:
             logger.error(f"Error creating GitHub release: {e}", exc_info=True)
@@ -1288,9 +1851,9 @@ class UpdateManager:
             if version_name:
                 commit_message += f" - {version_name}"
 
-            push_result = self.git_commit_and_push(
-                commit_message=commit_message,
-                github_token=github_token
+            # Blocking git commands run in a worker thread
+            push_result = await asyncio.get_running_loop().run_in_executor(
+                None, self.git_commit_and_push, commit_message, github_token
             )
             results["steps"]["git_push"] = push_result
 
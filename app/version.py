@@ -3,6 +3,7 @@ Version Management System for XUI Manager
 Handles version checking, comparison, and update information
 """
 
+from functools import lru_cache
 from typing import Dict, Optional, Tuple
 from datetime import datetime
 import re
@@ -13,6 +14,22 @@ VERSION_NAME = "Presets & Enhanced UI"
 GITHUB_REPO = "khiziresmars/xmanager"
 GITHUB_API_URL = f"https://api.github.com/repos/{GITHUB_REPO}/releases/latest"
 
+_VERSION_RE = re.compile(r'^(\d+)\.(\d+)\.(\d+)(?:-(.+))?$')
+
+
+@lru_cache(maxsize=64)
+def _parse_version(version_string: str) -> Tuple[int, int, int, Optional[str]]:
+    """Parse version string into (major, minor, patch, prerelease); the same few versions are parsed repeatedly"""
+    # Remove 'v' prefix if present
+    clean_version = version_string.lstrip('v')
+
+    # Parse version parts
+    match = _VERSION_RE.match(clean_version)
+    if not match:
+        raise ValueError(f"Invalid version format: {version_string}")
+
+    return int(match.group(1)), int(match.group(2)), int(match.group(3)), match.group(4)
+
 
 class Version:
     """Semantic version parser and comparator"""
@@ -24,18 +41,8 @@ class Version:
         Args:
             version_string: Version in format "MAJOR.MINOR.PATCH" or "vMAJOR.MINOR.PATCH"
         """
-        # Remove 'v' prefix if present
-        clean_version = version_string.lstrip('v')
-
-        # Parse version parts
-        match = re.match(r'^(\d+)\.(\d+)\.(\d+)(?:-(.+))?$', clean_version)
-        if not match:
-            raise ValueError(f"Invalid version format: {version_string}")
-
-        self.major = int(match.group(1))
-        self.minor = int(match.group(2))
-        self.patch = int(match.group(3))
-        self.prerelease = match.group(4)  # e.g., "beta", "rc1"
+        # prerelease e.g. "beta", "rc1"
+        self.major, self.minor, self.patch, self.prerelease = _parse_version(version_string)
 
     def __str__(self) -> str:
         """Return version as string"""
@@ -114,6 +121,13 @@ def parse_changelog(changelog_text: str) -> Dict:
     Returns:
         Parsed changelog with features, fixes, and breaking changes
     """
+    # Release notes rarely change between checks; copy so callers can't alter the cached result
+    return {section: list(items) for section, items in _parse_changelog(changelog_text)}
+
+
+@lru_cache(maxsize=16)
+def _parse_changelog(changelog_text: str) -> Tuple[Tuple[str, Tuple[str, ...]], ...]:
+    """Parse changelog text into immutable (section, items) pairs"""
     lines = changelog_text.split('\n')
 
     changelog = {
@@ -146,7 +160,7 @@ def parse_changelog(changelog_text: str) -> Dict:
             line = line.lstrip('-*').strip()
             changelog[current_section].append(line)
 
-    return changelog
+    return tuple((section, tuple(items)) for section, items in changelog.items())
 
 
 def get_version_info() -> Dict:
@@ -0,0 +1,66 @@
+import json
+import sqlite3
+
+from app.ssl_manager import SSLManager
+
+
+def _make_manager(tmp_path, settings, cert_domain):
+    db_path = tmp_path / "x-ui.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE settings (id INTEGER PRIMARY KEY, key TEXT, value TEXT)")
+    conn.executemany("INSERT INTO settings (key, value) VALUES (?, ?)", settings.items())
+    conn.commit()
+    conn.close()
+
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps({"certDomain": cert_domain}))
+
+    manager = SSLManager(str(db_path))
+    manager.xui_config_path = str(config_path)
+    return manager
+
+
+def test_database_domain_wins_over_stale_config_json(tmp_path):
+    manager = _make_manager(tmp_path, {"webDomain": "new.example.com"}, "old.example.com")
+    try:
+        assert manager.get_domain_from_config() == "new.example.com"
+    finally:
+        manager.close()
+
+
+def test_config_json_used_when_database_has_no_domain(tmp_path):
+    manager = _make_manager(tmp_path, {"webListen": "0.0.0.0"}, "old.example.com")
+    try:
+        assert manager.get_domain_from_config() == "old.example.com"
+    finally:
+        manager.close()
+
+
+def _add_certificate(manager, tmp_path, domain):
+    live_dir = tmp_path / "live" / domain
+    live_dir.mkdir(parents=True)
+    (live_dir / "fullchain.pem").write_text("cert")
+    (live_dir / "privkey.pem").write_text("key")
+    manager.letsencrypt_base = str(tmp_path / "live")
+
+
+def test_update_certificate_writes_database_settings(tmp_path):
+    manager = _make_manager(tmp_path, {"webDomain": "old.example.com"}, "old.example.com")
+    _add_certificate(manager, tmp_path, "new.example.com")
+    try:
+        assert manager.update_3xui_certificate("new.example.com")["success"]
+        manager.invalidate_domain_cache()
+        assert manager.get_domain_from_config() == "new.example.com"
+    finally:
+        manager.close()
+
+
+def test_update_certificate_without_database(tmp_path):
+    manager = SSLManager(str(tmp_path / "missing.db"))
+    manager.xui_config_path = str(tmp_path / "config.json")
+    _add_certificate(manager, tmp_path, "example.com")
+    try:
+        assert manager.update_3xui_certificate("example.com")["success"]
+        assert not (tmp_path / "missing.db").exists()
+    finally:
+        manager.close()
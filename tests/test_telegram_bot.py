@@ -0,0 +1,42 @@
+import asyncio
+
+from app.telegram_bot import AlertType, TelegramNotifier
+
+
+def _notifier(tmp_path, sent):
+    notifier = TelegramNotifier(bot_token="token", admin_ids=[1], history_file=str(tmp_path / "history.json"))
+
+    async def send_message(text, *args, **kwargs):
+        sent.append(text)
+        return True
+
+    notifier.send_message = send_message
+    return notifier
+
+
+def test_send_alert_return_values(tmp_path):
+    sent = []
+    notifier = _notifier(tmp_path, sent)
+
+    async def run():
+        queued = await notifier.send_alert(AlertType.CUSTOM, "queued", alert_key="a")
+        delivered = await notifier.send_alert(AlertType.CUSTOM, "now", alert_key="b", immediate=True)
+        await notifier.close()
+        return queued, delivered
+
+    assert asyncio.run(run()) == (None, True)
+    assert len(sent) == 2
+
+
+def test_clear_alert_history_drops_queued_alerts(tmp_path):
+    sent = []
+    notifier = _notifier(tmp_path, sent)
+
+    async def run():
+        await notifier.send_alert(AlertType.CUSTOM, "stale", alert_key="a")
+        notifier.clear_alert_history(AlertType.CUSTOM.value)
+        await notifier.close()
+
+    asyncio.run(run())
+    assert sent == []
+    assert notifier.get_alert_stats() == {}
@@ -0,0 +1,247 @@
+import asyncio
+import io
+import os
+import shutil
+import tarfile
+import threading
+from contextlib import asynccontextmanager
+
+import pytest
+
+from app import update_manager
+from app.update_manager import UpdateManager, _check_extracted_tree, _git_blob_sha, _swap_in_dir
+
+
+class _FakeContent:
+    def __init__(self, body):
+        self._body = body
+
+    async def iter_chunked(self, size):
+        for start in range(0, len(self._body), size):
+            yield self._body[start:start + size]
+
+
+class _FakeResponse:
+    def __init__(self, status=200, body=b"", data=None):
+        self.status = status
+        self.headers = {}
+        self.content = _FakeContent(body)
+        self._body = body
+        self._data = data
+
+    async def json(self):
+        return self._data
+
+    async def read(self):
+        return self._body
+
+
+def _fake_github(responses):
+    """_github_get replacement serving responses by URL suffix"""
+    @asynccontextmanager
+    async def github_get(url, timeout, headers=None):
+        for suffix, response in responses.items():
+            if url.endswith(suffix):
+                yield response
+                return
+        yield _FakeResponse(status=404)
+    return github_get
+
+
+def test_download_delta_verifies_blob_sha():
+    content = b"print('new')\n"
+    compare = {"files": [{"filename": "app/main.py", "status": "modified", "sha": _git_blob_sha(content)}]}
+    manager = UpdateManager()
+
+    manager._github_get = _fake_github({"...v2": _FakeResponse(data=compare), "app/main.py": _FakeResponse(body=content)})
+    result = asyncio.run(manager._download_delta("v1", "v2"))
+    assert result["success"]
+    assert result["changed_files"] == ["app/main.py"]
+    with open(os.path.join(result["temp_dir"], "app/main.py"), "rb") as f:
+        assert f.read() == content
+    shutil.rmtree(os.path.dirname(os.path.dirname(result["temp_dir"])))
+
+    tampered = _FakeResponse(body=b"print('evil')\n")
+    manager._github_get = _fake_github({"...v2": _FakeResponse(data=compare), "app/main.py": tampered})
+    result = asyncio.run(manager._download_delta("v1", "v2"))
+    assert not result["success"]
+    assert "mismatch" in result["error"]
+
+
+def test_download_delta_ignores_paths_outside_install():
+    compare = {"files": [{"filename": "app/../../etc/cron.d/x", "status": "added", "sha": "0" * 40}]}
+    manager = UpdateManager()
+    manager._github_get = _fake_github({"...v2": _FakeResponse(data=compare)})
+    result = asyncio.run(manager._download_delta("v1", "v2"))
+    assert result["changed_files"] == []
+    shutil.rmtree(os.path.dirname(os.path.dirname(result["temp_dir"])), ignore_errors=True)
+
+
+def test_swap_in_dir_stages_delta(tmp_path):
+    dest = tmp_path / "app"
+    dest.mkdir()
+    (dest / "changed.py").write_text("old")
+    (dest / "kept.py").write_text("kept")
+    (dest / "removed.py").write_text("gone")
+    # A second link to the installed file shows whether it was written through
+    os.link(dest / "changed.py", tmp_path / "changed.orig")
+
+    src = tmp_path / "delta"
+    (src / "sub").mkdir(parents=True)
+    (src / "changed.py").write_text("new")
+    (src / "sub" / "added.py").write_text("added")
+
+    _swap_in_dir(str(src), str(dest), ["changed.py", "sub/added.py"], ["removed.py"])
+
+    assert (dest / "changed.py").read_text() == "new"
+    assert (dest / "kept.py").read_text() == "kept"
+    assert (dest / "sub" / "added.py").read_text() == "added"
+    assert not (dest / "removed.py").exists()
+    assert (tmp_path / "changed.orig").read_text() == "old"
+    assert sorted(os.listdir(tmp_path)) == ["app", "changed.orig", "delta"]
+
+
+def test_is_update_path_rejects_traversal():
+    assert update_manager._is_update_path("app/main.py")
+    assert not update_manager._is_update_path("app/../etc/passwd")
+    assert not update_manager._is_update_path("/app/main.py")
+
+
+def _tarball(*members):
+    """gzipped tar of (TarInfo, data) members under a GitHub-style root directory"""
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
+        for info, data in members:
+            info.name = "repo-abc123/" + info.name
+            tar.addfile(info, io.BytesIO(data) if data is not None else None)
+    return buffer.getvalue()
+
+
+def test_check_extracted_tree(tmp_path):
+    tree = tmp_path / "tree"
+    (tree / "app").mkdir(parents=True)
+    (tree / "app" / "main.py").write_text("ok")
+    os.symlink("main.py", tree / "app" / "alias.py")
+    os.link(tree / "app" / "main.py", tree / "app" / "copy.py")
+    _check_extracted_tree(str(tree))
+
+    os.symlink("../../outside", tree / "app" / "escape")
+    with pytest.raises(Exception, match="escapes"):
+        _check_extracted_tree(str(tree))
+    os.remove(tree / "app" / "escape")
+
+    (tmp_path / "outside").write_text("secret")
+    os.link(tmp_path / "outside", tree / "app" / "linked")
+    with pytest.raises(Exception, match="hardlinks"):
+        _check_extracted_tree(str(tree))
+    os.remove(tree / "app" / "linked")
+
+    os.mkfifo(tree / "app" / "fifo")
+    with pytest.raises(Exception, match="special file"):
+        _check_extracted_tree(str(tree))
+
+
+def test_download_update_rejects_escaping_symlink():
+    data = b"print('hi')\n"
+    info = tarfile.TarInfo("app/main.py")
+    info.size = len(data)
+    link = tarfile.TarInfo("app/etc")
+    link.type = tarfile.SYMTYPE
+    link.linkname = "/etc"
+    manager = UpdateManager()
+    manager._github_get = _fake_github({"release.tar.gz": _FakeResponse(body=_tarball((info, data), (link, None)))})
+
+    result = asyncio.run(manager._download_update("https://example.com/release.tar.gz"))
+    assert not result["success"]
+    assert "escapes" in result["error"]
+
+
+def _update_manager_for_download(release, downloads):
+    """UpdateManager with everything but the download choice stubbed out"""
+    manager = UpdateManager()
+
+    async def noop(*args, **kwargs):
+        return {"success": True}
+
+    async def download_delta(old_ref, new_ref):
+        downloads.append(("delta", new_ref))
+        return {"success": True, "temp_dir": "/nonexistent", "changed_files": [], "removed_files": []}
+
+    async def download_update(url, expected_sha256=None):
+        downloads.append(("full", expected_sha256))
+        return {"success": False, "error": "SHA-256 mismatch"}
+
+    async def get_release(*args, **kwargs):
+        return release
+
+    manager._create_update_lock = lambda: True
+    manager._remove_update_lock = lambda: None
+    manager._update_status = noop
+    manager._create_backup = noop
+    manager._download_delta = download_delta
+    manager._download_update = download_update
+    manager._get_release_by_version = get_release
+    manager.check_for_updates = get_release
+    return manager
+
+
+@pytest.mark.parametrize("entry_point", ["perform_update", "perform_update_to_version"])
+def test_published_digest_skips_delta(entry_point):
+    release = {
+        "update_available": True,
+        "latest_version": "99.0.0",
+        "tag_name": "v99.0.0",
+        "download_url": "https://example.com/release.tar.gz",
+        "download_sha256": "ab" * 32,
+    }
+    downloads = []
+    manager = _update_manager_for_download(release, downloads)
+
+    result = asyncio.run(getattr(manager, entry_point)())
+    assert not result["success"]
+    assert downloads == [("full", "ab" * 32)]
+
+
+def test_delta_used_without_published_digest():
+    release = {
+        "update_available": True,
+        "latest_version": "99.0.0",
+        "tag_name": "v99.0.0",
+        "download_url": "https://example.com/release.tar.gz",
+    }
+    downloads = []
+    manager = _update_manager_for_download(release, downloads)
+
+    async def install_update(*args):
+        return {"success": False, "error": "stopped before install"}
+
+    manager._install_update = install_update
+
+    asyncio.run(manager.perform_update())
+    assert downloads == [("delta", "v99.0.0")]
+
+
+def test_install_update_runs_off_event_loop():
+    manager = UpdateManager()
+    threads = []
+
+    def apply_update(*args):
+        threads.append(threading.get_ident())
+        return {"success": True, "files_updated": [], "requirements_changed": False}
+
+    manager._apply_update = apply_update
+    assert asyncio.run(manager._install_update("/nonexistent"))["success"]
+    assert threads and threads[0] != threading.get_ident()
+
+
+def test_download_update_closes_pipe_when_tar_fails_to_start(monkeypatch):
+    async def fail_to_spawn(*args, **kwargs):
+        raise OSError("spawn failed")
+
+    monkeypatch.setattr(update_manager.shutil, "which", lambda name: "/usr/bin/tar")
+    monkeypatch.setattr(update_manager.asyncio, "create_subprocess_exec", fail_to_spawn)
+    open_fds = len(os.listdir("/proc/self/fd"))
+
+    result = asyncio.run(UpdateManager()._download_update("https://example.com/release.tar.gz"))
+    assert not result["success"]
+    assert len(os.listdir("/proc/self/fd")) == open_fds